@@ -0,0 +1,287 @@
+import asyncio
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple
+
+import jwt
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+
+from auth import ALGORITHM, SECRET_KEY
+from metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTIONS,
+)
+
+load_dotenv()
+
+# Endpoint classes, in priority order: interactive chat before bulk chapter work
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITY = (INTERACTIVE, BULK)
+
+# Configuration
+# Upstream-bound requests processed at once, and how many of those may be bulk
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_BULK_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_BULK_MAX_IN_FLIGHT", "8"))
+# Waiting requests per class beyond which new ones fail fast
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# How long a request may wait for a slot (0 = fail fast when saturated)
+ADMISSION_QUEUE_TIMEOUT_S = {
+    INTERACTIVE: float(os.getenv("ADMISSION_INTERACTIVE_QUEUE_TIMEOUT_S", "10")),
+    BULK: float(os.getenv("ADMISSION_BULK_QUEUE_TIMEOUT_S", "2")),
+}
+# Per-user token buckets (requests per minute and burst; rate 0 disables)
+RATE_LIMIT_PER_MINUTE = {
+    INTERACTIVE: float(os.getenv("RATE_LIMIT_INTERACTIVE_PER_MINUTE", "30")),
+    BULK: float(os.getenv("RATE_LIMIT_BULK_PER_MINUTE", "6")),
+}
+RATE_LIMIT_BURST = {
+    INTERACTIVE: float(os.getenv("RATE_LIMIT_INTERACTIVE_BURST", "10")),
+    BULK: float(os.getenv("RATE_LIMIT_BULK_BURST", "3")),
+}
+# Reverse proxies (IPs or CIDRs, comma-separated) whose X-Forwarded-For is
+# believed; anonymous callers behind them are keyed by the forwarded address
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.getenv("TRUSTED_PROXIES", "").split(",") if entry.strip()
+]
+# Number of distinct users whose buckets are remembered
+RATE_LIMIT_MAX_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-user, per-class token buckets with a bounded number of users"""
+
+    def __init__(self):
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def check(self, user_key: str, endpoint_class: str):
+        per_minute = RATE_LIMIT_PER_MINUTE[endpoint_class]
+        if per_minute <= 0:
+            return
+
+        key = (user_key, endpoint_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(per_minute / 60.0, max(RATE_LIMIT_BURST[endpoint_class], 1.0))
+            self._buckets[key] = bucket
+            if len(self._buckets) > RATE_LIMIT_MAX_USERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        wait = bucket.take()
+        if wait > 0:
+            raise AdmissionRejected("rate_limited", wait)
+
+
+class AdmissionController:
+    """
+    Bounded in-flight budget shared by all upstream-bound endpoints
+
+    Interactive requests may use the whole budget; bulk requests are capped
+    at a smaller share so they can never crowd out chat. When a slot frees
+    up, waiting interactive requests are admitted before waiting bulk ones.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, bulk_max_in_flight: int = ADMISSION_BULK_MAX_IN_FLIGHT):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.class_limits = {
+            INTERACTIVE: self.max_in_flight,
+            BULK: max(min(bulk_max_in_flight, self.max_in_flight), 1),
+        }
+        self.in_flight: Dict[str, int] = {name: 0 for name in PRIORITY}
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in PRIORITY}
+        # Smoothed time a request holds its slot, used for Retry-After hints
+        self._mean_hold = 1.0
+
+    def _total_in_flight(self) -> int:
+        return sum(self.in_flight.values())
+
+    def _has_room(self, endpoint_class: str) -> bool:
+        return (
+            self._total_in_flight() < self.max_in_flight
+            and self.in_flight[endpoint_class] < self.class_limits[endpoint_class]
+        )
+
+    def _retry_after(self, endpoint_class: str) -> float:
+        """Rough time until a slot frees up for a newcomer of this class"""
+        ahead = sum(len(self.waiters[name]) for name in PRIORITY[:PRIORITY.index(endpoint_class) + 1])
+        return self._mean_hold * (ahead + 1) / self.class_limits[endpoint_class]
+
+    def _admit(self, endpoint_class: str):
+        self.in_flight[endpoint_class] += 1
+        ADMISSION_IN_FLIGHT.labels(endpoint_class).inc()
+
+    async def acquire(self, endpoint_class: str, timeout: float):
+        """Wait up to `timeout` seconds for a slot or raise AdmissionRejected"""
+
+        # Nobody of equal or higher priority may be overtaken
+        ahead = any(self.waiters[name] for name in PRIORITY[:PRIORITY.index(endpoint_class) + 1])
+        if not ahead and self._has_room(endpoint_class):
+            self._admit(endpoint_class)
+            ADMISSION_QUEUE_WAIT.labels(endpoint_class).observe(0.0)
+            return
+
+        queue = self.waiters[endpoint_class]
+        if timeout <= 0 or len(queue) >= ADMISSION_MAX_QUEUE:
+            raise AdmissionRejected("saturated", self._retry_after(endpoint_class))
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        ADMISSION_QUEUE_DEPTH.labels(endpoint_class).inc()
+        started = time.monotonic()
+        try:
+            # The slot is transferred to us by release(), which sets the result
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            admitted = future.done() and not future.cancelled()
+            if not admitted:
+                future.cancel()
+                queue.remove(future)
+            if isinstance(e, asyncio.CancelledError):
+                # Client went away; give back a slot handed over meanwhile
+                if admitted:
+                    self._free(endpoint_class)
+                raise
+            if not admitted:
+                raise AdmissionRejected("queue_timeout", self._retry_after(endpoint_class))
+        finally:
+            ADMISSION_QUEUE_DEPTH.labels(endpoint_class).dec()
+        ADMISSION_QUEUE_WAIT.labels(endpoint_class).observe(time.monotonic() - started)
+
+    def release(self, endpoint_class: str, held: float):
+        """Free a slot after `held` seconds of use"""
+        self._mean_hold = 0.9 * self._mean_hold + 0.1 * held
+        self._free(endpoint_class)
+
+    def _free(self, endpoint_class: str):
+        """Give a slot back and hand it to the highest-priority waiter that fits"""
+        self.in_flight[endpoint_class] -= 1
+        ADMISSION_IN_FLIGHT.labels(endpoint_class).dec()
+
+        for name in PRIORITY:
+            queue = self.waiters[name]
+            while queue and self._has_room(name):
+                future = queue.popleft()
+                if future.cancelled():
+                    continue
+                self._admit(name)
+                future.set_result(None)
+
+
+admission_controller = AdmissionController()
+rate_limiter = RateLimiter()
+
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str:
+    """
+    The caller's address, looking through trusted proxies
+
+    X-Forwarded-For is read right to left, and only while each hop is a
+    TRUSTED_PROXIES address: the first untrusted hop is the client. A client
+    connecting directly can't choose its key by sending the header.
+    """
+    address = request.client.host if request.client else "unknown"
+    if not TRUSTED_PROXIES or not _trusted(address):
+        return address
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        address = hop
+        if not _trusted(hop):
+            break
+    return address
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller: the signed-in user if a valid token is sent, else the client IP"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except jwt.InvalidTokenError:
+            pass
+    return f"ip:{client_ip(request)}"
+
+
+def admit(endpoint_class: str, rate_limit: bool = True):
+    """
+    FastAPI dependency applying the per-user rate limit and the in-flight budget
+
+    Rejections are answered with 429 (user over their rate) or 503 (server
+    saturated), both with a Retry-After header. Routes with rate_limit=False
+    (ingestion and book admin, which send many small requests) only take an
+    in-flight slot.
+    """
+    timeout = ADMISSION_QUEUE_TIMEOUT_S[endpoint_class]
+
+    async def dependency(request: Request):
+        try:
+            if rate_limit:
+                rate_limiter.check(client_key(request), endpoint_class)
+            await admission_controller.acquire(endpoint_class, timeout)
+        except AdmissionRejected as e:
+            ADMISSION_REJECTIONS.labels(endpoint_class, e.reason).inc()
+            raise HTTPException(
+                status_code=(
+                    status.HTTP_429_TOO_MANY_REQUESTS if e.reason == "rate_limited"
+                    else status.HTTP_503_SERVICE_UNAVAILABLE
+                ),
+                detail="Too many requests, please retry later" if e.reason == "rate_limited"
+                else "Server is busy, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            admission_controller.release(endpoint_class, time.monotonic() - started)
+
+    return dependency
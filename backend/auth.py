@@ -8,6 +8,7 @@ import bcrypt
 from datetime import datetime, timedelta
 import os
 from uuid import uuid4
+from metrics import stage
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -91,7 +92,8 @@ async def signup(request: SignupRequest, db: Session = Depends(get_db)):
     User signup with background questionnaire
     """
     # Check if user exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
+    with stage("db_lookup"):
+        existing_user = db.query(User).filter(User.email == request.email).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -100,7 +102,8 @@ async def signup(request: SignupRequest, db: Session = Depends(get_db)):
     
     # Create new user
     user_id = str(uuid4())
-    hashed_password = hash_password(request.password)
+    with stage("password_hash"):
+        hashed_password = hash_password(request.password)
     
     new_user = User(
         id=user_id,
@@ -111,12 +114,14 @@ async def signup(request: SignupRequest, db: Session = Depends(get_db)):
         preferences=request.preferences
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    with stage("db_write"):
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
     
     # Create access token
-    access_token = create_access_token(user_id)
+    with stage("token"):
+        access_token = create_access_token(user_id)
     
     return AuthResponse(
         access_token=access_token,
@@ -133,16 +138,20 @@ async def signin(request: SigninRequest, db: Session = Depends(get_db)):
     """
     User signin
     """
-    user = db.query(User).filter(User.email == request.email).first()
+    with stage("db_lookup"):
+        user = db.query(User).filter(User.email == request.email).first()
     
-    if not user or not verify_password(request.password, user.password_hash):
+    with stage("password_verify"):
+        valid = user is not None and verify_password(request.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
     # Create access token
-    access_token = create_access_token(user.id)
+    with stage("token"):
+        access_token = create_access_token(user.id)
     
     return AuthResponse(
         access_token=access_token,
@@ -0,0 +1,51 @@
+"""Real book chapters used as benchmark payloads"""
+import glob
+import os
+import re
+from typing import Dict, List
+
+from benchmarks.harness import BACKEND_DIR
+
+BOOK_DOCS_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "book", "docs")
+
+FRONT_MATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+TITLE = re.compile(r"^title:\s*(.+)$", re.MULTILINE)
+
+
+def load_chapters(docs_dir: str = BOOK_DOCS_DIR) -> List[Dict[str, str]]:
+    """
+    Load the book's top-level chapters
+
+    Returns:
+        List of dicts with 'chapter' (slug), 'title' and 'content'
+    """
+    chapters = []
+    for path in sorted(glob.glob(os.path.join(docs_dir, "*.md*"))):
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+
+        title_match = TITLE.search(raw)
+        slug = os.path.splitext(os.path.basename(path))[0]
+        chapters.append({
+            "chapter": slug,
+            "title": title_match.group(1).strip() if title_match else slug,
+            "content": FRONT_MATTER.sub("", raw).strip(),
+        })
+    return chapters
+
+
+def chunk_text(text: str, max_chars: int = 800) -> List[str]:
+    """Split text on blank lines into chunks of at most roughly max_chars"""
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
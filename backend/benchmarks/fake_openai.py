@@ -0,0 +1,132 @@
+"""
+OpenAI-compatible stand-in for offline benchmarks
+
+Serves /v1/embeddings and /v1/chat/completions with configurable latency and
+token rates. Embeddings are deterministic hashed bag-of-words vectors, so
+texts sharing words land close together and retrieval behaves sensibly.
+
+Run standalone with:
+    uvicorn benchmarks.fake_openai:app --port 8100
+"""
+import asyncio
+import hashlib
+import math
+import os
+import re
+import time
+from typing import List, Optional, Union
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+# Configuration
+FAKE_OPENAI_EMBEDDING_DIM = int(os.getenv("FAKE_OPENAI_EMBEDDING_DIM", "1536"))
+# Fixed cost of every embeddings call, plus a per-input cost
+FAKE_OPENAI_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_OPENAI_EMBEDDING_LATENCY_MS", "30"))
+FAKE_OPENAI_EMBEDDING_PER_INPUT_MS = float(os.getenv("FAKE_OPENAI_EMBEDDING_PER_INPUT_MS", "0.5"))
+# Time to first token, then a steady generation rate
+FAKE_OPENAI_CHAT_LATENCY_MS = float(os.getenv("FAKE_OPENAI_CHAT_LATENCY_MS", "200"))
+FAKE_OPENAI_TOKENS_PER_SEC = float(os.getenv("FAKE_OPENAI_TOKENS_PER_SEC", "400"))
+# Completion length when the request doesn't cap it lower
+FAKE_OPENAI_COMPLETION_TOKENS = int(os.getenv("FAKE_OPENAI_COMPLETION_TOKENS", "150"))
+
+WORD_PATTERN = re.compile(r"\w+")
+
+app = FastAPI(title="Fake OpenAI")
+
+
+class EmbeddingRequest(BaseModel):
+    model: str
+    input: Union[str, List[str]]
+    dimensions: Optional[int] = None
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str
+    messages: List[ChatMessage]
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count: about four characters per token"""
+    return max(1, len(text) // 4)
+
+
+def embed(text: str, dim: int = FAKE_OPENAI_EMBEDDING_DIM) -> List[float]:
+    """Deterministic unit-length hashed bag-of-words embedding"""
+    vector = [0.0] * dim
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0.0:
+        vector[0] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: EmbeddingRequest) -> dict:
+    inputs = [request.input] if isinstance(request.input, str) else request.input
+
+    await asyncio.sleep(
+        (FAKE_OPENAI_EMBEDDING_LATENCY_MS + FAKE_OPENAI_EMBEDDING_PER_INPUT_MS * len(inputs)) / 1000.0
+    )
+
+    prompt_tokens = sum(count_tokens(text) for text in inputs)
+    return {
+        "object": "list",
+        "model": request.model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": embed(text, request.dimensions or FAKE_OPENAI_EMBEDDING_DIM)}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest) -> dict:
+    prompt_tokens = sum(count_tokens(message.content) for message in request.messages)
+    completion_tokens = FAKE_OPENAI_COMPLETION_TOKENS
+    if request.max_tokens is not None:
+        completion_tokens = min(completion_tokens, request.max_tokens)
+
+    await asyncio.sleep(
+        FAKE_OPENAI_CHAT_LATENCY_MS / 1000.0 + completion_tokens / FAKE_OPENAI_TOKENS_PER_SEC
+    )
+
+    # Echo the last message, cut or padded to the completion length, so
+    # response sizes behave like a translation of the input would
+    last = request.messages[-1].content if request.messages else ""
+    content = last[:completion_tokens * 4]
+    padding = completion_tokens - count_tokens(content) if content else completion_tokens
+    if padding > 0:
+        content = " ".join([content] + ["lorem"] * padding).strip()
+
+    return {
+        "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
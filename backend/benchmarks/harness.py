@@ -0,0 +1,85 @@
+"""Starts the API against local stand-ins for OpenAI, Qdrant and Postgres"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = 30.0):
+    """Poll a URL until it answers or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+@contextmanager
+def uvicorn_process(app: str, port: int, env: Dict[str, str], workers: int = 1) -> Iterator[str]:
+    """Run a uvicorn app in a subprocess for the duration of the block"""
+    command = [
+        sys.executable, "-m", "uvicorn", app,
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--workers", str(workers),
+        "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url + "/")
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextmanager
+def offline_stack(
+    fake_openai_env: Optional[Dict[str, str]] = None,
+    app_env: Optional[Dict[str, str]] = None,
+    workers: int = 1
+) -> Iterator[str]:
+    """
+    Start the fake OpenAI server and the API wired to it
+
+    The API uses an in-memory Qdrant and a throwaway SQLite database, so no
+    network access or credentials are needed. Yields the API base URL.
+    """
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        openai_port = free_port()
+        with uvicorn_process("benchmarks.fake_openai:app", openai_port, fake_openai_env or {}) as openai_url:
+            env = {
+                "OPENAI_API_KEY": "benchmark",
+                "OPENAI_BASE_URL": openai_url + "/v1",
+                "QDRANT_URL": ":memory:",
+                "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                "LOG_LEVEL": "WARNING",
+                # All load comes from one client IP standing in for many users
+                "RATE_LIMIT_INTERACTIVE_PER_MINUTE": "0",
+                "RATE_LIMIT_BULK_PER_MINUTE": "0",
+                **(app_env or {}),
+            }
+            with uvicorn_process("main:app", free_port(), env, workers=workers) as api_url:
+                yield api_url
@@ -0,0 +1,156 @@
+"""
+Response size and latency of the chapter endpoints on a real book chapter
+
+Sends one chapter to /api/translate-chapter and /api/personalize-chapter in
+full and lean mode, asking for identity, gzip and brotli encodings. Reports
+the bytes on the wire, p50/p95 latency, and the estimated transfer time over
+a slow link. A warm-up request fills the translation/personalization cache
+first, so the numbers cover serialization, compression and transfer rather
+than the LLM. Also times stdlib json against orjson on the full body.
+
+Usage (from the backend directory):
+    python -m benchmarks.payload --chapter 02-web-dev-basics --requests 30 --output payload.json
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+import orjson
+
+from benchmarks.corpus import load_chapters
+from benchmarks.harness import offline_stack
+from benchmarks.report import print_table, run_metadata, summarize, write_json
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+BACKGROUND = {
+    "programming_experience": "beginner",
+    "preferred_languages": ["python"],
+    "topics_of_interest": ["web development"],
+}
+
+
+def chapter_bodies(chapter: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    return {
+        "/api/translate-chapter": {
+            "chapter_title": chapter["title"],
+            "chapter_content": chapter["content"],
+            "target_language": "urdu",
+        },
+        "/api/personalize-chapter": {
+            "chapter_title": chapter["title"],
+            "chapter_content": chapter["content"],
+            "background": BACKGROUND,
+        },
+    }
+
+
+def measure(client: httpx.Client, path: str, body: Dict[str, Any], encoding: str, requests: int) -> Dict[str, Any]:
+    headers = {"Accept-Encoding": encoding}
+    latencies: List[float] = []
+    wire_bytes = body_bytes = 0
+    content_encoding = None
+    for _ in range(requests):
+        started = time.perf_counter()
+        with client.stream("POST", path, json=body, headers=headers) as response:
+            response.raise_for_status()
+            content = response.read()
+            wire_bytes = response.num_bytes_downloaded
+        latencies.append(time.perf_counter() - started)
+        body_bytes = len(content)
+        content_encoding = response.headers.get("content-encoding", "identity")
+    return {
+        "wire_bytes": wire_bytes,
+        "body_bytes": body_bytes,
+        "content_encoding": content_encoding,
+        **summarize(latencies),
+    }
+
+
+def serialization_ms(body: Dict[str, Any], rounds: int = 200) -> Dict[str, float]:
+    """Median time to render a response body with stdlib json and with orjson"""
+    def median_ms(render) -> float:
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            render()
+            samples.append((time.perf_counter() - started) * 1000.0)
+        return round(sorted(samples)[len(samples) // 2], 4)
+
+    return {
+        # What FastAPI's default JSONResponse does
+        "stdlib_json_ms": median_ms(lambda: json.dumps(
+            body, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")),
+        "orjson_ms": median_ms(lambda: orjson.dumps(body)),
+    }
+
+
+def run(base_url: str, chapter: Dict[str, str], requests: int, link_mbps: float):
+    rows = []
+    serialization = {}
+    with httpx.Client(base_url=base_url, timeout=300.0) as client:
+        for path, body in chapter_bodies(chapter).items():
+            # Warm the cache so every measured request skips the LLM
+            full = client.post(path, json=body).json()
+            serialization[path] = serialization_ms(full)
+
+            for lean in (False, True):
+                for encoding in ENCODINGS:
+                    result = measure(client, path, {**body, "lean": lean}, encoding, requests)
+                    rows.append({
+                        "endpoint": path,
+                        "mode": "lean" if lean else "full",
+                        "encoding": result["content_encoding"],
+                        "wire_bytes": result["wire_bytes"],
+                        "body_bytes": result["body_bytes"],
+                        f"ms_at_{link_mbps:g}mbps": round(result["wire_bytes"] * 8 / (link_mbps * 1000.0), 1),
+                        "p50_ms": result["p50_ms"],
+                        "p95_ms": result["p95_ms"],
+                    })
+    return rows, serialization
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapter", default="02-web-dev-basics", help="Chapter slug under book/docs")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint/mode/encoding")
+    parser.add_argument("--link-mbps", type=float, default=10.0, help="Link speed for the transfer estimate")
+    parser.add_argument("--base-url", help="Target a running API instead of the offline stack")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    chapters = {chapter["chapter"]: chapter for chapter in load_chapters()}
+    if args.chapter not in chapters:
+        print(f"Unknown chapter {args.chapter!r}; available: {', '.join(chapters)}", file=sys.stderr)
+        return 2
+    chapter = chapters[args.chapter]
+
+    if args.base_url:
+        rows, serialization = run(args.base_url, chapter, args.requests, args.link_mbps)
+    else:
+        # Completions as long as the chapter, like a real translation
+        fake_openai_env = {"FAKE_OPENAI_COMPLETION_TOKENS": "4000", "FAKE_OPENAI_TOKENS_PER_SEC": "100000"}
+        with offline_stack(fake_openai_env) as base_url:
+            rows, serialization = run(base_url, chapter, args.requests, args.link_mbps)
+
+    print(f"Chapter {args.chapter}: {len(chapter['content'].encode())} bytes of content\n")
+    print_table(rows, list(rows[0].keys()))
+    print()
+    for path, timings in serialization.items():
+        print(f"{path} full body render: json {timings['stdlib_json_ms']} ms, orjson {timings['orjson_ms']} ms")
+
+    if args.output:
+        write_json(args.output, {
+            "meta": run_metadata({"chapter": args.chapter, "requests": args.requests, "link_mbps": args.link_mbps}),
+            "results": rows,
+            "serialization": serialization,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""
+Trace-replay load generator for multi-turn chat sessions
+
+Replays recorded or synthetic session traces against /api/chat with
+open-loop session arrivals: sessions start on their trace schedule whether or
+not the server has kept up. Within a session, each turn waits for the
+previous reply (a reader can't ask a follow-up before reading the answer) and
+resends the growing conversation_history, or with --server-sessions sends only
+the session_id returned by the first reply.
+
+Trace format (JSON lines, one session per line):
+    {"session_id": "s1", "start_s": 12.5,
+     "turns": [{"offset_s": 0.0, "message": "What is a list?", "selected_text": null},
+               {"offset_s": 20.0, "message": "And a tuple?"}]}
+
+Usage (from the backend directory):
+    python -m benchmarks.replay --synthetic --sessions 200 --duration 120 --output replay.json
+    python -m benchmarks.replay --trace sessions.jsonl --speed 4 --base-url http://localhost:8000
+    python -m benchmarks.replay --synthetic --server-sessions --output replay-sessions.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.corpus import load_chapters
+from benchmarks.harness import offline_stack
+from benchmarks.report import print_table, run_metadata, summarize, write_json
+from benchmarks.run import QUESTIONS
+
+FOLLOW_UPS = [
+    "Can you give an example?",
+    "Why does that matter?",
+    "How is that different from what you said before?",
+    "Can you explain that more simply?",
+    "What would an advanced developer do here?",
+    "Show me the code for that",
+]
+
+# Request body size buckets, upper bounds in bytes
+PAYLOAD_BUCKETS = [(1024, "<1KB"), (4096, "1-4KB"), (16384, "4-16KB"), (65536, "16-64KB")]
+LARGEST_PAYLOAD_BUCKET = ">=64KB"
+
+
+def payload_bucket(size: int) -> str:
+    for limit, label in PAYLOAD_BUCKETS:
+        if size < limit:
+            return label
+    return LARGEST_PAYLOAD_BUCKET
+
+
+def arrival_rate(t: float, base_rate: float, burst_period: float, burst_width: float, burst_factor: float) -> float:
+    """Sessions per second at time t: a base rate with periodic class-time bursts"""
+    if burst_period > 0 and (t % burst_period) < burst_width:
+        return base_rate * burst_factor
+    return base_rate
+
+
+def synthetic_trace(
+    sessions: int,
+    duration: float,
+    burst_period: float,
+    burst_width: float,
+    burst_factor: float,
+    mean_turns: float,
+    mean_think_s: float,
+    selected_text_probability: float,
+    seed: int
+) -> List[Dict[str, Any]]:
+    """
+    Generate sessions with bursty Poisson arrivals and growing conversations
+
+    Arrivals follow a non-homogeneous Poisson process (sampled by thinning)
+    whose rate is scaled so about `sessions` sessions start within `duration`.
+    """
+    rng = random.Random(seed)
+    chapters = [chapter["content"] for chapter in load_chapters()]
+
+    # Pick the base rate so the expected number of arrivals matches `sessions`
+    burst_share = (burst_width / burst_period) if burst_period > 0 else 0.0
+    mean_multiplier = 1.0 + burst_share * (burst_factor - 1.0)
+    base_rate = sessions / duration / mean_multiplier
+    peak_rate = base_rate * max(burst_factor, 1.0)
+
+    starts: List[float] = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(peak_rate)
+        if t >= duration:
+            break
+        rate = arrival_rate(t, base_rate, burst_period, burst_width, burst_factor)
+        if rng.random() < rate / peak_rate:
+            starts.append(t)
+
+    trace = []
+    for index, start in enumerate(starts):
+        # Geometric number of turns with the requested mean
+        turn_count = 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - 1.0 / mean_turns)) if mean_turns > 1 else 1
+
+        turns = []
+        offset = 0.0
+        for turn in range(turn_count):
+            message = rng.choice(QUESTIONS) if turn == 0 else rng.choice(FOLLOW_UPS)
+            selected_text = None
+            if rng.random() < selected_text_probability:
+                chapter = rng.choice(chapters)
+                length = min(len(chapter), int(rng.uniform(100, 3000)))
+                begin = rng.randrange(0, max(1, len(chapter) - length))
+                selected_text = chapter[begin:begin + length]
+            turns.append({"offset_s": round(offset, 3), "message": message, "selected_text": selected_text})
+            offset += rng.expovariate(1.0 / mean_think_s) if mean_think_s > 0 else 0.0
+
+        trace.append({"session_id": f"synthetic-{index}", "start_s": round(start, 3), "turns": turns})
+    return trace
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_trace(path: str, trace: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        for session in trace:
+            f.write(json.dumps(session) + "\n")
+
+
+async def replay_session(
+    client: httpx.AsyncClient,
+    session: Dict[str, Any],
+    run_start: float,
+    speed: float,
+    samples: List[Dict[str, Any]],
+    server_sessions: bool = False
+):
+    """Play one session's turns, each no earlier than its scheduled time"""
+    history: List[Dict[str, str]] = []
+    session_id = None
+    session_start = run_start + session.get("start_s", 0.0) / speed
+
+    for turn_number, turn in enumerate(session["turns"], start=1):
+        scheduled = session_start + turn.get("offset_s", 0.0) / speed
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        body: Dict[str, Any] = {"message": turn["message"], "user_id": session["session_id"]}
+        if turn.get("selected_text"):
+            body["selected_text"] = turn["selected_text"]
+        if session_id:
+            body["session_id"] = session_id
+        elif history:
+            body["conversation_history"] = history
+        payload = json.dumps(body).encode()
+
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/chat", content=payload, headers={"Content-Type": "application/json"}
+            )
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response = None
+            ok = False
+        elapsed = time.perf_counter() - started
+
+        samples.append({
+            "turn": turn_number,
+            "payload_bytes": len(payload),
+            "latency": elapsed,
+            # How far behind schedule the request went out
+            "lag": max(0.0, started - scheduled),
+            "ok": ok,
+        })
+        if not ok:
+            return
+
+        reply = response.json()
+        if server_sessions:
+            session_id = reply.get("session_id")
+        else:
+            history.append({"role": "user", "content": turn["message"]})
+            history.append({"role": "assistant", "content": reply["message"]})
+
+
+def group(samples: List[Dict[str, Any]], key, label: str) -> List[Dict[str, Any]]:
+    """Latency summary per group of successful samples"""
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for sample in samples:
+        groups.setdefault(key(sample), []).append(sample)
+
+    rows = []
+    for name in sorted(groups, key=lambda g: (isinstance(g, str), g)):
+        members = groups[name]
+        latencies = [s["latency"] for s in members if s["ok"]]
+        rows.append({
+            label: name,
+            "requests": len(members),
+            "errors": sum(1 for s in members if not s["ok"]),
+            "mean_payload_bytes": round(sum(s["payload_bytes"] for s in members) / len(members)),
+            **summarize(latencies),
+        })
+    return rows
+
+
+async def replay(
+    base_url: str,
+    trace: List[Dict[str, Any]],
+    speed: float,
+    timeout: float,
+    server_sessions: bool = False
+) -> List[Dict[str, Any]]:
+    samples: List[Dict[str, Any]] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        run_start = time.perf_counter()
+        await asyncio.gather(*(
+            replay_session(client, session, run_start, speed, samples, server_sessions) for session in trace
+        ))
+    return samples
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="JSON lines session trace to replay")
+    source.add_argument("--synthetic", action="store_true", help="Generate a synthetic trace")
+    parser.add_argument("--base-url", help="Target a running API instead of the offline stack")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up factor")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--save-trace", help="Write the (synthetic) trace to this path")
+    parser.add_argument("--max-turn", type=int, default=10, help="Report turns beyond this together")
+    parser.add_argument(
+        "--server-sessions", action="store_true",
+        help="Send the session_id from the first reply instead of the full history",
+    )
+
+    synthetic = parser.add_argument_group("synthetic trace")
+    synthetic.add_argument("--sessions", type=int, default=100)
+    synthetic.add_argument("--duration", type=float, default=60.0, help="Seconds over which sessions start")
+    synthetic.add_argument("--burst-period", type=float, default=30.0, help="Seconds between class-time bursts")
+    synthetic.add_argument("--burst-width", type=float, default=5.0, help="Length of each burst in seconds")
+    synthetic.add_argument("--burst-factor", type=float, default=8.0, help="Arrival rate multiplier in a burst")
+    synthetic.add_argument("--mean-turns", type=float, default=4.0)
+    synthetic.add_argument("--mean-think", type=float, default=5.0, help="Mean seconds between turns")
+    synthetic.add_argument("--selected-text", type=float, default=0.3, help="Probability a turn has selected_text")
+    synthetic.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.synthetic:
+        trace = synthetic_trace(
+            args.sessions, args.duration, args.burst_period, args.burst_width, args.burst_factor,
+            args.mean_turns, args.mean_think, args.selected_text, args.seed,
+        )
+    else:
+        trace = load_trace(args.trace)
+    if args.save_trace:
+        save_trace(args.save_trace, trace)
+
+    print(
+        f"Replaying {len(trace)} sessions / {sum(len(s['turns']) for s in trace)} turns "
+        f"at {args.speed}x",
+        file=sys.stderr,
+    )
+
+    if args.base_url:
+        samples = asyncio.run(replay(args.base_url, trace, args.speed, args.timeout, args.server_sessions))
+    else:
+        with offline_stack() as base_url:
+            samples = asyncio.run(replay(base_url, trace, args.speed, args.timeout, args.server_sessions))
+
+    by_turn = group(samples, lambda s: min(s["turn"], args.max_turn), "turn")
+    for row in by_turn:
+        if row["turn"] == args.max_turn:
+            row["turn"] = f"{args.max_turn}+"
+    by_payload = group(samples, lambda s: payload_bucket(s["payload_bytes"]), "payload")
+    ordered = [label for _, label in PAYLOAD_BUCKETS] + [LARGEST_PAYLOAD_BUCKET]
+    by_payload.sort(key=lambda row: ordered.index(row["payload"]))
+    lags = sorted(s["lag"] for s in samples)
+
+    columns = ["requests", "errors", "mean_payload_bytes", "p50_ms", "p95_ms", "p99_ms"]
+    print("\nLatency by turn number:")
+    print_table(by_turn, ["turn"] + columns)
+    print("\nLatency by request payload size:")
+    print_table(by_payload, ["payload"] + columns)
+    print(f"\nSchedule lag: {summarize(lags)}")
+
+    if args.output:
+        write_json(args.output, {
+            "meta": run_metadata({
+                "trace": args.trace or "synthetic",
+                "sessions": len(trace),
+                "speed": args.speed,
+                "server_sessions": args.server_sessions,
+                "base_url": args.base_url or "offline",
+            }),
+            "overall": summarize([s["latency"] for s in samples if s["ok"]]),
+            "errors": sum(1 for s in samples if not s["ok"]),
+            "schedule_lag": summarize(lags),
+            "by_turn": by_turn,
+            "by_payload": by_payload,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
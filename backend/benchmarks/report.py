@@ -0,0 +1,69 @@
+"""Latency summaries and result files shared by the benchmark tools"""
+import json
+import platform
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.harness import BACKEND_DIR
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Linearly interpolated percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    position = fraction * (len(sorted_values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99, mean and max of latencies given in seconds, in milliseconds"""
+    values = sorted(latencies)
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000.0, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000.0, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000.0, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000.0, 2),
+        "max_ms": round(values[-1] * 1000.0, 2),
+    }
+
+
+def run_metadata(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Context needed to compare result files across releases"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = "unknown"
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config or {},
+    }
+
+
+def write_json(path: str, data: Dict[str, Any]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def print_table(rows: List[Dict[str, Any]], columns: List[str]):
+    """Print result rows as an aligned plain-text table"""
+    widths = {
+        column: max([len(column)] + [len(str(row.get(column, ""))) for row in rows])
+        for column in columns
+    }
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row.get(column, "")).ljust(widths[column]) for column in columns))
@@ -0,0 +1,264 @@
+"""
+Offline benchmark of the main API endpoints
+
+Starts the API against the fake OpenAI server and an in-memory Qdrant, then
+drives each endpoint with a closed loop of concurrent clients and reports
+throughput and p50/p95/p99 latency per concurrency level.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --concurrency 1,8,32 --requests 200 --output bench.json
+    python -m benchmarks.run --baseline bench-1.0.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from benchmarks.corpus import chunk_text, load_chapters
+from benchmarks.harness import offline_stack
+from benchmarks.report import print_table, run_metadata, summarize, write_json
+
+QUESTIONS = [
+    "What is Python?",
+    "How do lists differ from tuples?",
+    "Explain how HTTP requests work",
+    "What is a REST API and when would I build one?",
+    "How do I define a function with default arguments?",
+    "What does the DOM do in a web page?",
+]
+
+BENCHMARK_EMAIL = "bench@example.com"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+class Scenario:
+    """One endpoint under test and the factory for its request bodies"""
+
+    def __init__(self, name: str, path: str, make_body: Callable[[int], Dict[str, Any]]):
+        self.name = name
+        self.path = path
+        self.make_body = make_body
+
+
+def build_scenarios(chapters: List[Dict[str, str]]) -> Dict[str, Scenario]:
+    chunks = [
+        (chapter["chapter"], text)
+        for chapter in chapters
+        for text in chunk_text(chapter["content"])
+    ]
+    chapter_cycle = itertools.cycle(chapters)
+    sequence = itertools.count()
+
+    def chapter_body(i: int) -> Dict[str, Any]:
+        chapter = next(chapter_cycle)
+        # Prefix a run-wide request number so the translation cache never short-circuits
+        return {
+            "chapter_title": chapter["title"],
+            "chapter_content": f"Request {next(sequence)}.\n\n{chapter['content']}",
+            "target_language": "urdu",
+        }
+
+    return {
+        "chat": Scenario(
+            "chat", "/api/chat",
+            lambda i: {"message": QUESTIONS[i % len(QUESTIONS)]},
+        ),
+        "add-content": Scenario(
+            "add-content", "/api/add-content",
+            lambda i: {
+                "text": f"{chunks[i % len(chunks)][1]}\n\n(revision {i})",
+                "chapter": chunks[i % len(chunks)][0],
+                "section": f"bench-{i}",
+            },
+        ),
+        "translate-chapter": Scenario("translate-chapter", "/api/translate-chapter", chapter_body),
+        "signin": Scenario(
+            "signin", "/api/auth/signin",
+            lambda i: {"email": BENCHMARK_EMAIL, "password": BENCHMARK_PASSWORD},
+        ),
+    }
+
+
+async def seed(client: httpx.AsyncClient, chapters: List[Dict[str, str]]):
+    """Index the book and create the sign-in user before measuring"""
+    for chapter in chapters:
+        for i, text in enumerate(chunk_text(chapter["content"])):
+            response = await client.post("/api/add-content", json={
+                "text": text,
+                "chapter": chapter["chapter"],
+                "section": str(i),
+            })
+            response.raise_for_status()
+
+    response = await client.post("/api/auth/signup", json={
+        "email": BENCHMARK_EMAIL,
+        "name": "Benchmark",
+        "password": BENCHMARK_PASSWORD,
+        "background": {"softwareExperience": "intermediate"},
+    })
+    if response.status_code not in (200, 400):
+        response.raise_for_status()
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    total_requests: int
+) -> Dict[str, Any]:
+    """Closed loop: `concurrency` clients each send their next request on reply"""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= total_requests:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(scenario.path, json=scenario.make_body(i))
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    return {
+        "endpoint": scenario.path,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        **summarize(latencies),
+    }
+
+
+async def run_benchmarks(base_url: str, args) -> List[Dict[str, Any]]:
+    chapters = load_chapters()
+    scenarios = build_scenarios(chapters)
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 8)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await seed(client, chapters)
+
+        results = []
+        for name in args.endpoints:
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency)
+                # Warm up connections and caches outside the measurement
+                await run_level(client, scenarios[name], concurrency, concurrency)
+                result = await run_level(client, scenarios[name], concurrency, total)
+                results.append(result)
+                print(
+                    f"{name:<18} c={concurrency:<4} {result['throughput_rps']:>8} req/s  "
+                    f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+                    f"errors={result['errors']}",
+                    file=sys.stderr,
+                )
+        return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> List[Dict[str, Any]]:
+    """Rows whose p95 grew by more than max_regression relative to the baseline"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {
+            (row["endpoint"], row["concurrency"]): row
+            for row in json.load(f)["results"]
+        }
+
+    regressions = []
+    for row in results:
+        before = baseline.get((row["endpoint"], row["concurrency"]))
+        if not before or not before["p95_ms"]:
+            continue
+        change = row["p95_ms"] / before["p95_ms"] - 1.0
+        if change > max_regression:
+            regressions.append({
+                "endpoint": row["endpoint"],
+                "concurrency": row["concurrency"],
+                "baseline_p95_ms": before["p95_ms"],
+                "p95_ms": row["p95_ms"],
+                "change": f"{change:+.0%}",
+            })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--endpoints",
+        type=lambda s: s.split(","),
+        default=["chat", "add-content", "translate-chapter", "signin"],
+        help="Comma-separated: chat, add-content, translate-chapter, signin",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(c) for c in s.split(",")],
+        default=[1, 8, 32],
+        help="Comma-separated concurrency levels",
+    )
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and level")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--chat-latency-ms", type=float, default=200.0, help="Fake time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=400.0, help="Fake generation rate")
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0, help="Fake embeddings call latency")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Previous JSON result to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95 increase")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.endpoints) - {"chat", "add-content", "translate-chapter", "signin"}
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    fake_openai_env = {
+        "FAKE_OPENAI_CHAT_LATENCY_MS": str(args.chat_latency_ms),
+        "FAKE_OPENAI_TOKENS_PER_SEC": str(args.tokens_per_sec),
+        "FAKE_OPENAI_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+    }
+
+    with offline_stack(fake_openai_env, workers=args.workers) as base_url:
+        results = asyncio.run(run_benchmarks(base_url, args))
+
+    print_table(results, [
+        "endpoint", "concurrency", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors",
+    ])
+
+    if args.output:
+        write_json(args.output, {
+            "meta": run_metadata({**fake_openai_env, "workers": args.workers, "requests": args.requests}),
+            "results": results,
+        })
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            print_table(regressions, ["endpoint", "concurrency", "baseline_p95_ms", "p95_ms", "change"])
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Cold-start measurement for the API
+
+Reports, as medians over several fresh processes:
+- import_ms: time to `import main` (module-level side effects)
+- ready_ms: process spawn until /api/health answers under uvicorn
+
+Usage (from the backend directory):
+    python -m benchmarks.startup --runs 5 --output startup.json
+    python -m benchmarks.startup --max-import-ms 1500   # exit 1 if slower
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import BACKEND_DIR, free_port, uvicorn_process
+from benchmarks.report import run_metadata, write_json
+
+IMPORT_PROBE = (
+    "import time; started = time.perf_counter(); import main; "
+    "print((time.perf_counter() - started) * 1000.0)"
+)
+
+
+def offline_env(workdir: str) -> dict:
+    return {
+        "OPENAI_API_KEY": "benchmark",
+        "QDRANT_URL": ":memory:",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def measure_import(env: dict) -> float:
+    """Milliseconds to import the app module in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_ready(env: dict) -> float:
+    """Milliseconds from spawning uvicorn until the app serves requests"""
+    started = time.perf_counter()
+    with uvicorn_process("main:app", free_port(), env):
+        return (time.perf_counter() - started) * 1000.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, help="Fail if the median time to ready exceeds this")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="rag-startup-") as workdir:
+        env = offline_env(workdir)
+        imports = [measure_import(env) for _ in range(args.runs)]
+        readies = [measure_ready(env) for _ in range(args.runs)]
+
+    result = {
+        "import_ms": round(statistics.median(imports), 1),
+        "ready_ms": round(statistics.median(readies), 1),
+        "import_runs_ms": [round(v, 1) for v in imports],
+        "ready_runs_ms": [round(v, 1) for v in readies],
+    }
+    print(f"import main: {result['import_ms']} ms   ready: {result['ready_ms']} ms (median of {args.runs})")
+
+    if args.output:
+        write_json(args.output, {"meta": run_metadata({"runs": args.runs}), **result})
+
+    failed = (
+        (args.max_import_ms is not None and result["import_ms"] > args.max_import_ms)
+        or (args.max_ready_ms is not None and result["ready_ms"] > args.max_ready_ms)
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from qdrant_client.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    Distance,
+    VectorParams,
+)
+
+from clients import get_qdrant_client
+from database import Book, SessionLocal
+from embeddings import get_embedding_provider
+
+load_dotenv()
+
+# Configuration
+DEFAULT_BOOK_ID = os.getenv("DEFAULT_BOOK_ID", "default")
+# How long a worker trusts its copy of a book's routing before re-reading it
+BOOK_CACHE_TTL_S = float(os.getenv("BOOK_CACHE_TTL_S", "30"))
+
+# The default book keeps the collection name used before multi-book support
+LEGACY_COLLECTION_NAME = "book_content"
+# What every collection held before embedding providers were recorded
+LEGACY_EMBEDDING = {"provider": "openai", "model": "text-embedding-3-small", "dimension": 1536}
+
+# "__" separates a collection's version suffix, so IDs can't contain it:
+# otherwise book "a__v2" would name book "a"'s second collection
+BOOK_ID_PATTERN = re.compile(r"^(?!.*__)[a-z0-9][a-z0-9_-]{0,63}$")
+# Would map onto the default book's legacy collection name
+RESERVED_BOOK_IDS = {LEGACY_COLLECTION_NAME[len("book_"):]}
+
+
+class InvalidBookId(ValueError):
+    """Book IDs are lowercase letters, digits, '-' and '_' (not "__"), at most 64 characters"""
+
+
+class BookNotFound(LookupError):
+    pass
+
+
+class BookExists(Exception):
+    pass
+
+
+class EmbeddingMismatch(Exception):
+    """The collection holds vectors from a different embedding provider, model or dimension"""
+
+
+def _check_embedding(book_id: str, recorded: Optional[dict]):
+    current = get_embedding_provider().spec
+    recorded = recorded or LEGACY_EMBEDDING
+    if recorded != current:
+        raise EmbeddingMismatch(
+            f"Book {book_id} was indexed with {recorded['provider']}/{recorded['model']} "
+            f"({recorded['dimension']}d) but this server embeds with "
+            f"{current['provider']}/{current['model']} ({current['dimension']}d); rebuild the book"
+        )
+
+
+def collection_for(book_id: str) -> str:
+    """
+    Name that chat queries for a book: an alias to its live collection
+
+    Raises:
+        InvalidBookId: book_id can't be used in a collection name
+    """
+    if book_id == DEFAULT_BOOK_ID:
+        return LEGACY_COLLECTION_NAME
+    if not BOOK_ID_PATTERN.match(book_id) or book_id in RESERVED_BOOK_IDS:
+        raise InvalidBookId(f"Invalid book_id: {book_id!r}")
+    return f"book_{book_id}"
+
+
+def _versioned(collection: str, version: int) -> str:
+    return f"{collection}__v{version}"
+
+
+def _create_collection(name: str, dimension: int):
+    get_qdrant_client().create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=dimension, distance=Distance.COSINE),
+    )
+
+
+def _collection_dimension(name: str) -> int:
+    return get_qdrant_client().get_collection(name).config.params.vectors.size
+
+
+def _is_alias(name: str) -> bool:
+    return any(alias.alias_name == name for alias in get_qdrant_client().get_aliases().aliases)
+
+
+def _point_alias(alias: str, collection: str, replace: bool):
+    operations = []
+    if replace:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=collection, alias_name=alias)))
+    # Applied atomically: queries see either the old or the new collection
+    get_qdrant_client().update_collection_aliases(change_aliases_operations=operations)
+
+
+def _as_dict(book: Book) -> dict:
+    return {
+        "book_id": book.id,
+        "title": book.title,
+        "collection": book.collection,
+        "live_collection": book.live_collection,
+        "staging_collection": book.staging_collection,
+        "embedding": book.embedding or LEGACY_EMBEDDING,
+        "staging_embedding": book.staging_embedding,
+        "version": book.version,
+        "created_at": book.created_at.isoformat() if book.created_at else None,
+        "updated_at": book.updated_at.isoformat() if book.updated_at else None,
+    }
+
+
+# Per-worker routing cache: book_id -> (collection, expires_at). Only hits are
+# cached, so a book created on another worker is visible immediately.
+_routes: Dict[str, Tuple[str, float]] = {}
+_routes_lock = threading.Lock()
+
+
+def _forget(book_id: str):
+    with _routes_lock:
+        _routes.pop(book_id, None)
+
+
+def search_collection(book_id: str) -> str:
+    """
+    Collection a chat query for this book should search
+
+    Raises:
+        InvalidBookId: malformed book_id
+        BookNotFound: no such book
+        EmbeddingMismatch: the book was indexed with another embedding provider
+    """
+    collection = collection_for(book_id)
+    now = time.monotonic()
+    with _routes_lock:
+        cached = _routes.get(book_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    db = SessionLocal()
+    try:
+        book = db.get(Book, book_id)
+    finally:
+        db.close()
+    if book is None:
+        raise BookNotFound(f"Unknown book: {book_id}")
+    _check_embedding(book_id, book.embedding)
+
+    with _routes_lock:
+        _routes[book_id] = (collection, now + BOOK_CACHE_TTL_S)
+    return collection
+
+
+def ingest_collection(book_id: str) -> str:
+    """
+    Collection new content for this book goes into
+
+    While a rebuild is in progress this is the staging collection, so chat
+    keeps serving the old index until the rebuild is published. Always read
+    from the database: a stale answer here would lose chunks.
+
+    Raises:
+        InvalidBookId: malformed book_id
+        BookNotFound: no such book
+        EmbeddingMismatch: the target collection holds another provider's vectors
+    """
+    collection_for(book_id)
+    db = SessionLocal()
+    try:
+        book = db.get(Book, book_id)
+        if book is None:
+            raise BookNotFound(f"Unknown book: {book_id}")
+        if book.staging_collection:
+            _check_embedding(book_id, book.staging_embedding)
+            return book.staging_collection
+        _check_embedding(book_id, book.embedding)
+        return book.collection
+    finally:
+        db.close()
+
+
+def list_books() -> List[dict]:
+    db = SessionLocal()
+    try:
+        return [_as_dict(book) for book in db.query(Book).order_by(Book.id).all()]
+    finally:
+        db.close()
+
+
+def get_book(book_id: str) -> dict:
+    """
+    Raises:
+        InvalidBookId: malformed book_id
+        BookNotFound: no such book
+    """
+    collection_for(book_id)
+    db = SessionLocal()
+    try:
+        book = db.get(Book, book_id)
+        if book is None:
+            raise BookNotFound(f"Unknown book: {book_id}")
+        return _as_dict(book)
+    finally:
+        db.close()
+
+
+def create_book(book_id: str, title: Optional[str] = None) -> dict:
+    """
+    Create a book with an empty index for the current embedding provider
+
+    Raises:
+        InvalidBookId: malformed book_id
+        BookExists: the book, or collections under its name, already exist
+    """
+    collection = collection_for(book_id)
+    db = SessionLocal()
+    try:
+        if db.get(Book, book_id) is not None:
+            raise BookExists(f"Book already exists: {book_id}")
+
+        client = get_qdrant_client()
+        embedding = get_embedding_provider().spec
+        if book_id == DEFAULT_BOOK_ID and client.collection_exists(collection) and not _is_alias(collection):
+            # Data indexed before multi-book support: adopt the collection as is
+            live = collection
+            if _collection_dimension(collection) != LEGACY_EMBEDDING["dimension"]:
+                embedding = {"provider": "unknown", "model": "unknown", "dimension": _collection_dimension(collection)}
+            else:
+                embedding = LEGACY_EMBEDDING
+        else:
+            live = _versioned(collection, 1)
+            if client.collection_exists(live) or _is_alias(collection):
+                # Left over from a book whose row is gone; never take over an index silently
+                raise BookExists(f"Collections for book {book_id} already exist in Qdrant")
+            _create_collection(live, embedding["dimension"])
+            _point_alias(collection, live, replace=False)
+
+        book = Book(
+            id=book_id, title=title, collection=collection, live_collection=live, version=1, embedding=embedding
+        )
+        db.add(book)
+        db.commit()
+        return _as_dict(book)
+    finally:
+        db.close()
+
+
+def ensure_book(book_id: str, title: Optional[str] = None):
+    """Create the book unless it exists; safe to call from every worker at startup"""
+    try:
+        create_book(book_id, title)
+    except Exception:
+        # Another worker may have won the race; only fail if it still doesn't exist
+        db = SessionLocal()
+        try:
+            if db.get(Book, book_id) is None:
+                raise
+        finally:
+            db.close()
+
+
+def rebuild_book(book_id: str) -> dict:
+    """
+    Start re-indexing a book into a fresh staging collection
+
+    Chat keeps using the live collection; content added from now on goes to
+    staging until publish_book swaps it in. Calling this again during a
+    rebuild discards the staging collection and starts over. The staging
+    collection is made for the current embedding provider, so a rebuild is
+    also how a book moves to another provider.
+
+    Raises:
+        BookNotFound: no such book
+    """
+    collection = collection_for(book_id)
+    db = SessionLocal()
+    try:
+        book = db.get(Book, book_id)
+        if book is None:
+            raise BookNotFound(f"Unknown book: {book_id}")
+
+        client = get_qdrant_client()
+        if book.staging_collection:
+            client.delete_collection(collection_name=book.staging_collection)
+        book.version += 1
+        staging = _versioned(collection, book.version)
+        embedding = get_embedding_provider().spec
+        _create_collection(staging, embedding["dimension"])
+        book.staging_collection = staging
+        book.staging_embedding = embedding
+        db.commit()
+        return _as_dict(book)
+    finally:
+        db.close()
+
+
+def publish_book(book_id: str) -> dict:
+    """
+    Make a rebuild's staging collection live and drop the old one
+
+    Raises:
+        BookNotFound: no such book, or no rebuild in progress
+    """
+    collection = collection_for(book_id)
+    db = SessionLocal()
+    try:
+        book = db.get(Book, book_id)
+        if book is None or not book.staging_collection:
+            raise BookNotFound(f"No rebuild in progress for book: {book_id}")
+
+        client = get_qdrant_client()
+        old = book.live_collection
+        if old == collection:
+            # A legacy collection holds the alias's name; it has to go first,
+            # so searches briefly find nothing
+            client.delete_collection(collection_name=old)
+            _point_alias(collection, book.staging_collection, replace=False)
+        else:
+            _point_alias(collection, book.staging_collection, replace=True)
+            client.delete_collection(collection_name=old)
+
+        book.live_collection = book.staging_collection
+        book.embedding = book.staging_embedding
+        book.staging_collection = None
+        book.staging_embedding = None
+        db.commit()
+        return _as_dict(book)
+    finally:
+        db.close()
+        _forget(book_id)
+
+
+def drop_book(book_id: str):
+    """
+    Delete a book and every collection behind it
+
+    Raises:
+        BookNotFound: no such book
+    """
+    collection = collection_for(book_id)
+    db = SessionLocal()
+    try:
+        book = db.get(Book, book_id)
+        if book is None:
+            raise BookNotFound(f"Unknown book: {book_id}")
+
+        client = get_qdrant_client()
+        if book.collection != book.live_collection:
+            client.update_collection_aliases(
+                change_aliases_operations=[DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=collection))]
+            )
+        for name in (book.live_collection, book.staging_collection):
+            if name:
+                client.delete_collection(collection_name=name)
+
+        db.delete(book)
+        db.commit()
+    finally:
+        db.close()
+        _forget(book_id)
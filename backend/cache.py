@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+
+from metrics import record_upstream_error
+
+load_dotenv()
+
+# Configuration
+# memory: per-process (default); sqlite: file shared by all workers on a host;
+# redis: any Redis-protocol server shared by all hosts
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "./cache.db")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+# Values at least this large are zlib-compressed before storing
+COMPRESS_MIN_BYTES = 512
+
+# First byte of every stored value says how the rest is encoded
+RAW = b"\x00"
+ZLIB = b"\x01"
+
+
+class CacheBackend:
+    """Byte-oriented key/value store shared by the translator, personalizer and embeddings"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = CACHE_TTL_S):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = CACHE_TTL_S):
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache; each worker keeps its own copy"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = CACHE_TTL_S):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    On-disk cache in a SQLite file
+
+    All workers on the same host open the same file, so a value computed by
+    one worker is a hit for every other one. WAL mode lets readers proceed
+    while a writer commits. Errors (e.g. "database is locked" under heavy
+    write contention) degrade to cache misses and dropped writes, like an
+    unreachable Redis server.
+    """
+
+    # Chance that a write also purges expired rows
+    PURGE_PROBABILITY = 0.001
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        try:
+            rows = self._connection().execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at >= ?)",
+                [*keys, time.time()],
+            ).fetchall()
+        except sqlite3.Error as e:
+            record_upstream_error("sqlite", "get", e)
+            return [None] * len(keys)
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = CACHE_TTL_S):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = CACHE_TTL_S):
+        if not items:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            connection = self._connection()
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()],
+            )
+            if random.random() < self.PURGE_PROBABILITY:
+                connection.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        except sqlite3.Error as e:
+            record_upstream_error("sqlite", "set", e)
+
+    def delete(self, key: str):
+        try:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            record_upstream_error("sqlite", "delete", e)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache on a Redis-protocol server, shared by every worker on every host
+
+    An unreachable server degrades to cache misses rather than failed requests.
+    """
+
+    def __init__(self, url: str = CACHE_URL, client: Any = None):
+        """
+        Args:
+            url: redis:// URL of the server
+            client: Ready-made client (e.g. a local stand-in); overrides url
+        """
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        try:
+            return self.client.mget(list(keys))
+        except Exception as e:
+            record_upstream_error("redis", "get", e)
+            return [None] * len(keys)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = CACHE_TTL_S):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = CACHE_TTL_S):
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipeline.set(key, value, px=_ttl_ms(ttl))
+            pipeline.execute()
+        except Exception as e:
+            record_upstream_error("redis", "set", e)
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            record_upstream_error("redis", "delete", e)
+
+
+def _ttl_ms(ttl: Optional[float]) -> Optional[int]:
+    return max(int(ttl * 1000), 1) if ttl else None
+
+
+_cache: Optional[CacheBackend] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """The process-wide cache backend selected by CACHE_BACKEND"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if CACHE_BACKEND == "sqlite":
+                    _cache = SQLiteCache(CACHE_PATH)
+                elif CACHE_BACKEND == "redis":
+                    _cache = RedisCache(CACHE_URL)
+                elif CACHE_BACKEND == "memory":
+                    _cache = MemoryCache()
+                else:
+                    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+    return _cache
+
+
+# Keys and serialization
+def make_key(namespace: str, *parts: Any) -> str:
+    """Fixed-length key from a namespace and any JSON-serializable parts"""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode()
+    ).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def _pack(data: bytes) -> bytes:
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return ZLIB + compressed
+    return RAW + data
+
+
+def _unpack(blob: bytes) -> bytes:
+    if blob[:1] == ZLIB:
+        return zlib.decompress(blob[1:])
+    return blob[1:]
+
+
+def pack_text(text: str) -> bytes:
+    return _pack(text.encode("utf-8"))
+
+
+def unpack_text(blob: bytes) -> str:
+    return _unpack(blob).decode("utf-8")
+
+
+def pack_json(value: Any) -> bytes:
+    return _pack(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_json(blob: bytes) -> Any:
+    return json.loads(_unpack(blob))
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """float32 array: 6 KB for a 1536-d embedding instead of ~30 KB of JSON"""
+    return RAW + array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob[1:])
+    return values.tolist()
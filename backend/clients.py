@@ -0,0 +1,104 @@
+import importlib.util
+import os
+import threading
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI
+from qdrant_client import QdrantClient
+
+load_dotenv()
+
+# Configuration
+UPSTREAM_CONNECT_TIMEOUT_S = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_S", "5"))
+UPSTREAM_READ_TIMEOUT_S = float(os.getenv("UPSTREAM_READ_TIMEOUT_S", "60"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY_S = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY_S", "30"))
+# HTTP/2 is only used when the optional h2 package is installed
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_openai_client: Optional[OpenAI] = None
+_qdrant_client: Optional[QdrantClient] = None
+
+
+def http2_available() -> bool:
+    return UPSTREAM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def upstream_timeout() -> httpx.Timeout:
+    return httpx.Timeout(UPSTREAM_READ_TIMEOUT_S, connect=UPSTREAM_CONNECT_TIMEOUT_S)
+
+
+def upstream_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY_S,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Pooled keep-alive HTTP client shared by every OpenAI call in the process"""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    http2=http2_available(),
+                    timeout=upstream_timeout(),
+                    limits=upstream_limits(),
+                )
+    return _http_client
+
+
+def get_openai_client() -> OpenAI:
+    """The shared OpenAI client, created on first use"""
+    global _openai_client
+    if _openai_client is None:
+        http_client = get_http_client()
+        with _lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=http_client,
+                    timeout=upstream_timeout(),
+                )
+    return _openai_client
+
+
+def get_qdrant_client() -> QdrantClient:
+    """
+    The shared Qdrant client, created on first use
+
+    The REST transport gets the same keep-alive pool limits and HTTP/2
+    setting as the OpenAI client. QDRANT_URL may also be ":memory:" for an
+    in-process store (tests, benchmarks).
+    """
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _lock:
+            if _qdrant_client is None:
+                _qdrant_client = QdrantClient(
+                    location=os.getenv("QDRANT_URL", "http://localhost:6333"),
+                    api_key=os.getenv("QDRANT_API_KEY"),
+                    timeout=int(UPSTREAM_READ_TIMEOUT_S),
+                    # Forwarded to the REST client's httpx pool
+                    limits=upstream_limits(),
+                    http2=http2_available(),
+                )
+    return _qdrant_client
+
+
+def close_clients():
+    """Close pooled connections; the next get_* call creates fresh clients"""
+    global _http_client, _openai_client, _qdrant_client
+    with _lock:
+        if _qdrant_client is not None:
+            _qdrant_client.close()
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = _openai_client = _qdrant_client = None
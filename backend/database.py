@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, DateTime, JSON
+from sqlalchemy import create_engine, Column, String, DateTime, Integer, JSON, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -56,6 +56,59 @@ class ContentChunk(Base):
     embedding = Column(JSON)  # Vector embedding
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class Book(Base):
+    __tablename__ = "books"
+    
+    id = Column(String, primary_key=True)
+    title = Column(String, nullable=True)
+    collection = Column(String)  # Name queries use: an alias, or a legacy collection
+    live_collection = Column(String)  # Physical collection currently behind it
+    staging_collection = Column(String, nullable=True)  # Being filled by a rebuild
+    embedding = Column(JSON, nullable=True)  # Provider, model and dimension of the live vectors
+    staging_embedding = Column(JSON, nullable=True)  # Same for the staging collection
+    version = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True)
+    kind = Column(String)  # translate-chapter or personalize-chapter
+    cache_key = Column(String, index=True)  # Same input, same key: repeats reuse the result
+    status = Column(String, index=True)  # queued, running, succeeded, failed, cancelled
+    request = Column(JSON)
+    result = Column(JSON, nullable=True)  # Filled in segment by segment
+    error = Column(String, nullable=True)
+    segments_total = Column(Integer, default=0)
+    segments_done = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class FaqChapter(Base):
+    __tablename__ = "faq_chapters"
+
+    id = Column(String, primary_key=True)  # "<book_id>:<chapter>"
+    book_id = Column(String, index=True)
+    chapter = Column(String)
+    content_hash = Column(String)  # Hash of the chunks the entries were generated from
+    embedding = Column(JSON)  # Provider, model and dimension of the question vectors
+    generated_at = Column(DateTime, default=datetime.utcnow)
+
+class FaqEntry(Base):
+    __tablename__ = "faq_entries"
+
+    id = Column(String, primary_key=True)
+    book_id = Column(String, index=True)
+    chapter = Column(String, index=True)
+    question = Column(String)
+    answer = Column(String)
+    sources = Column(JSON)
+    vector = Column(LargeBinary)  # float32 question embedding
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # Create tables
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_DELAY, record_upstream_error
+
+load_dotenv()
+
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+
+# Number of recent batches kept for the percentile figures in stats()
+STATS_WINDOW = 1024
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched calls"""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE
+    ):
+        """
+        Args:
+            embed_batch: Blocking function embedding a list of texts in one call
+            window_ms: How long the first queued text waits for company
+            max_batch_size: Flush immediately once this many texts are queued
+        """
+        self.embed_batch = embed_batch
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self._batches = 0
+        self._texts = 0
+        self._recent_sizes: Deque[int] = deque(maxlen=STATS_WINDOW)
+        self._recent_delays: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue a text and wait for its embedding from the next batch"""
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Hand everything queued so far to a background batch call"""
+
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        """Embed one batch off the event loop and resolve the waiting futures"""
+
+        started = time.perf_counter()
+
+        # Identical queries arriving together only need to be embedded once
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+
+        self._batches += 1
+        self._texts += len(batch)
+        self._recent_sizes.append(len(batch))
+        EMBEDDING_BATCH_SIZE.observe(len(batch))
+        for _, _, enqueued in batch:
+            self._recent_delays.append(started - enqueued)
+            EMBEDDING_QUEUE_DELAY.observe(started - enqueued)
+
+        try:
+            vectors = await asyncio.to_thread(self.embed_batch, unique_texts)
+        except Exception as e:
+            record_upstream_error("openai", "embeddings", e)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> Dict[str, float]:
+        """Batch size and queueing delay figures for tuning the window"""
+
+        sizes = sorted(self._recent_sizes)
+        delays = sorted(self._recent_delays)
+
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self._batches,
+            "texts": self._texts,
+            "pending": len(self._pending),
+            "mean_batch_size": self._texts / self._batches if self._batches else 0.0,
+            "p50_batch_size": _percentile(sizes, 0.50),
+            "max_batch_size_seen": sizes[-1] if sizes else 0,
+            "p50_queue_delay_ms": _percentile(delays, 0.50) * 1000.0,
+            "p95_queue_delay_ms": _percentile(delays, 0.95) * 1000.0,
+            "max_queue_delay_ms": (delays[-1] if delays else 0.0) * 1000.0,
+        }
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
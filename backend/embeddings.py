@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from clients import get_openai_client
+
+load_dotenv()
+
+# Configuration
+# openai (default), local (CPU model directory) or hashing (deterministic, for tests)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+OPENAI_EMBEDDING_DIMENSION = int(os.getenv("OPENAI_EMBEDDING_DIMENSION", "1536"))
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "./models/embedding")
+EMBEDDING_LOCAL_WORKERS = int(os.getenv("EMBEDDING_LOCAL_WORKERS", "4"))
+EMBEDDING_LOCAL_BATCH_SIZE = int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", "256"))
+EMBEDDING_HASHING_DIMENSION = int(os.getenv("EMBEDDING_HASHING_DIMENSION", "384"))
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Output width of OpenAI embedding models when no dimensions are requested
+OPENAI_NATIVE_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+# Only these models accept the dimensions parameter
+OPENAI_SHORTENABLE_PREFIX = "text-embedding-3"
+# Files that make up a local model, hashed into its identity
+LOCAL_MODEL_FILES = ("config.json", "embeddings.npy", "vocab.txt", "model.safetensors", "tokenizer.json")
+
+
+class EmbeddingProvider:
+    """Turns texts into fixed-size vectors for ingestion and queries"""
+
+    # Short provider name recorded with each collection
+    name = "base"
+
+    def __init__(self, model: str, dimension: int):
+        self.model = model
+        self.dimension = dimension
+
+    @property
+    def spec(self) -> Dict[str, object]:
+        """What a collection records: vectors from another spec don't belong in it"""
+        return {"provider": self.name, "model": self.model, "dimension": self.dimension}
+
+    @property
+    def cache_id(self) -> str:
+        """Part of embedding cache keys; identical vectors share an ID"""
+        return f"{self.name}:{self.model}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one batch, preserving order"""
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI's embeddings API: one HTTP call per batch"""
+
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, dimension: int = OPENAI_EMBEDDING_DIMENSION):
+        super().__init__(model, dimension)
+
+    @property
+    def cache_id(self) -> str:
+        # Bare model name at the native width, matching keys cached before
+        # providers existed; shortened vectors get keys of their own
+        if OPENAI_NATIVE_DIMENSIONS.get(self.model) == self.dimension:
+            return self.model
+        return f"{self.model}:{self.dimension}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        options = {}
+        if self.model.startswith(OPENAI_SHORTENABLE_PREFIX):
+            options["dimensions"] = self.dimension
+        response = get_openai_client().embeddings.create(model=self.model, input=texts, **options)
+        # The API may return items out of order; index restores the input order
+        vectors = [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        if vectors and len(vectors[0]) != self.dimension:
+            raise ValueError(
+                f"{self.model} returned {len(vectors[0])}-d embeddings; OPENAI_EMBEDDING_DIMENSION is {self.dimension}"
+            )
+        return vectors
+
+
+def model_digest(model_dir: str) -> str:
+    """Short sha256 over a local model's files; changes whenever the model does"""
+    digest = hashlib.sha256()
+    for filename in LOCAL_MODEL_FILES:
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            continue
+        digest.update(filename.encode("utf-8") + b"\x00")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Static token-embedding model run on the CPU
+
+    A text's vector is the mean of its tokens' rows in an embedding matrix,
+    L2-normalized. That is a gather and a segmented sum per batch, so large
+    batches are split into EMBEDDING_LOCAL_BATCH_SIZE chunks that run on a
+    thread pool (numpy releases the GIL for the heavy work).
+
+    The model directory holds either:
+    - embeddings.npy (vocab x dimension) and vocab.txt (one token per line,
+      row order), plus an optional config.json {"lowercase": true}; or
+    - model.safetensors and tokenizer.json, as exported by model2vec. This
+      needs the optional safetensors and tokenizers packages.
+
+    The model's identity is its name plus a hash of those files, so two
+    models sharing a directory name and dimension are still told apart.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_dir: str = EMBEDDING_MODEL_DIR,
+        workers: int = EMBEDDING_LOCAL_WORKERS,
+        batch_size: int = EMBEDDING_LOCAL_BATCH_SIZE
+    ):
+        config = {}
+        config_path = os.path.join(model_dir, "config.json")
+        if os.path.exists(config_path):
+            with open(config_path, encoding="utf-8") as f:
+                config = json.load(f)
+        self.lowercase = config.get("lowercase", True)
+        self.batch_size = max(batch_size, 1)
+        self._tokenizer = None
+        self._vocab: Dict[str, int] = {}
+
+        if os.path.exists(os.path.join(model_dir, "embeddings.npy")):
+            # Memory-mapped: workers on a host share the pages
+            self.vectors = np.load(os.path.join(model_dir, "embeddings.npy"), mmap_mode="r")
+            with open(os.path.join(model_dir, "vocab.txt"), encoding="utf-8") as f:
+                self._vocab = {line.rstrip("\n"): i for i, line in enumerate(f)}
+        else:
+            from safetensors.numpy import load_file
+            from tokenizers import Tokenizer
+
+            tensors = load_file(os.path.join(model_dir, "model.safetensors"))
+            self.vectors = tensors.get("embeddings", next(iter(tensors.values())))
+            self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+
+        name = config.get("name", os.path.basename(os.path.normpath(model_dir)))
+        super().__init__(f"{name}@{model_digest(model_dir)}", int(self.vectors.shape[1]))
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="embed")
+
+    def _token_ids(self, texts: List[str]) -> List[List[int]]:
+        if self.lowercase:
+            texts = [text.lower() for text in texts]
+        if self._tokenizer is not None:
+            return [encoding.ids for encoding in self._tokenizer.encode_batch(texts, add_special_tokens=False)]
+        vocab = self._vocab
+        return [[vocab[token] for token in TOKEN_PATTERN.findall(text) if token in vocab] for text in texts]
+
+    def _embed_chunk(self, texts: List[str]) -> np.ndarray:
+        ids = self._token_ids(texts)
+        counts = np.array([len(row) for row in ids], dtype=np.int64)
+        result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        present = counts > 0
+        if present.any():
+            flat = np.fromiter((i for row in ids for i in row), dtype=np.int64, count=int(counts.sum()))
+            starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+            sums = np.add.reduceat(np.asarray(self.vectors[flat], dtype=np.float32), starts, axis=0)
+            result[present] = sums / counts[present, None]
+        norms = np.linalg.norm(result, axis=1, keepdims=True)
+        return result / np.where(norms == 0, 1.0, norms)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(chunks) == 1:
+            return self._embed_chunk(chunks[0]).tolist()
+        return np.concatenate(list(self._executor.map(self._embed_chunk, chunks))).tolist()
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic hashed bag-of-words vectors
+
+    Needs no model or network, and texts sharing words land close together,
+    so retrieval behaves sensibly in tests and offline development.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = EMBEDDING_HASHING_DIMENSION):
+        super().__init__("blake2b-bow", dimension)
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.name}:{self.model}:{self.dimension}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+                # Signed hashing keeps unrelated tokens from adding up
+                result[row, digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(result, axis=1, keepdims=True)
+        return (result / np.where(norms == 0, 1.0, norms)).tolist()
+
+
+_provider: Optional[EmbeddingProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """The process-wide embedding provider selected by EMBEDDING_PROVIDER"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if EMBEDDING_PROVIDER == "openai":
+                    _provider = OpenAIEmbeddingProvider()
+                elif EMBEDDING_PROVIDER == "local":
+                    _provider = LocalEmbeddingProvider()
+                elif EMBEDDING_PROVIDER == "hashing":
+                    _provider = HashingEmbeddingProvider()
+                else:
+                    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {EMBEDDING_PROVIDER}")
+    return _provider
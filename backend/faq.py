@@ -0,0 +1,328 @@
+"""
+Precomputed FAQ answers per chapter
+
+An offline job reads each chapter's chunks from the book's index, asks the
+LLM for the questions readers most likely ask about it with answers grounded
+in those chunks, and stores them with their question embeddings. At chat
+time, a question close enough to a stored one is answered from the store,
+skipping search and completion.
+
+Usage (from the backend directory):
+    python -m faq generate --book default
+    python -m faq generate --book default --chapter ch3 --force
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from books import collection_for, get_book
+from clients import get_qdrant_client
+from database import FaqChapter, FaqEntry, SessionLocal
+from embeddings import get_embedding_provider
+from metrics import record_upstream_error, record_usage
+from resilience import complete, served_by_fallback
+
+load_dotenv()
+
+logger = logging.getLogger("rag.faq")
+
+# Configuration
+# Answer close matches from the FAQ store before searching
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "true").lower() == "true"
+# Cosine similarity between the question and a stored question needed to reuse its answer
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.92"))
+FAQ_QUESTIONS_PER_CHAPTER = int(os.getenv("FAQ_QUESTIONS_PER_CHAPTER", "20"))
+FAQ_MODEL = os.getenv("FAQ_MODEL", os.getenv("OPENAI_CHAT_MODEL", "gpt-4.1-mini"))
+# Chapter text sent to the LLM per generation call
+FAQ_CONTEXT_CHARS = int(os.getenv("FAQ_CONTEXT_CHARS", "12000"))
+# How long a worker keeps a book's FAQ entries before re-reading them
+FAQ_CACHE_TTL_S = float(os.getenv("FAQ_CACHE_TTL_S", "60"))
+
+SCROLL_PAGE_SIZE = 512
+
+FAQ_PROMPT = """You write the FAQ for one chapter of a book.
+List the {count} questions readers are most likely to ask about this chapter,
+each with a concise answer based only on the numbered excerpts below.
+Skip questions the excerpts don't answer.
+Reply with JSON: {{"faqs": [{{"question": "...", "answer": "...", "excerpts": [1, 2]}}]}}
+where "excerpts" lists the excerpt numbers the answer is based on."""
+
+
+class FallbackAnswer(RuntimeError):
+    """A fallback model, not FAQ_MODEL, answered the generation call"""
+
+
+def _chapter_chunks(book_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Payloads of a book's live chunks, grouped by chapter in a stable order"""
+    client = get_qdrant_client()
+    collection = collection_for(book_id)
+    chapters: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    offset = None
+    while True:
+        page, offset = client.scroll(
+            collection_name=collection,
+            limit=SCROLL_PAGE_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        for point in page:
+            if point.payload.get("text"):
+                chapters[point.payload.get("chapter") or "unknown"].append(point.payload)
+        if offset is None:
+            break
+    for chunks in chapters.values():
+        chunks.sort(key=lambda chunk: (str(chunk.get("section") or ""), chunk["text"]))
+    return chapters
+
+
+def content_hash(chunks: Sequence[Dict[str, Any]]) -> str:
+    """Changes whenever a chapter's chunks do, and only then"""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk["text"].encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _generate(chapter: str, chunks: Sequence[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    """
+    Ask the LLM for a chapter's FAQ; entries cite their excerpts' sources
+
+    Raises:
+        FallbackAnswer: a fallback model answered instead of FAQ_MODEL
+    """
+    excerpts = []
+    used = 0
+    for chunk in chunks:
+        if used and used + len(chunk["text"]) > FAQ_CONTEXT_CHARS:
+            break
+        excerpts.append(chunk)
+        used += len(chunk["text"])
+    numbered = "\n\n".join(f"[{i}] {chunk['text']}" for i, chunk in enumerate(excerpts, 1))
+
+    response = complete(
+        "faq", FAQ_MODEL,
+        messages=[
+            {"role": "system", "content": FAQ_PROMPT.format(count=count)},
+            {"role": "user", "content": f"Chapter: {chapter}\n\n{numbered}"},
+        ],
+        temperature=0.2,
+        response_format={"type": "json_object"},
+    )
+    record_usage(response)
+    if served_by_fallback(response):
+        # Entries are served for every later match, so they must come from FAQ_MODEL
+        raise FallbackAnswer(f"FAQ for {chapter} was answered by fallback model {response._served_model}")
+    faqs = json.loads(response.choices[0].message.content).get("faqs", [])
+
+    entries = []
+    for faq in faqs[:count]:
+        if not isinstance(faq, dict) or not faq.get("question") or not faq.get("answer"):
+            continue
+        cited = [excerpts[i - 1] for i in faq.get("excerpts", []) if isinstance(i, int) and 0 < i <= len(excerpts)]
+        entries.append({
+            "question": faq["question"].strip(),
+            "answer": faq["answer"].strip(),
+            "sources": sorted({chunk.get("source", "unknown") for chunk in cited or excerpts}),
+        })
+    return entries
+
+
+def generate_faqs(
+    book_id: str,
+    chapters: Optional[Sequence[str]] = None,
+    force: bool = False,
+    count: int = FAQ_QUESTIONS_PER_CHAPTER
+) -> Dict[str, Any]:
+    """
+    Generate FAQ entries for a book's chapters whose content changed
+
+    A chapter is regenerated when the hash of its chunks differs from the one
+    its entries were made from, when the embedding provider changed, or when
+    force is set. Entries of chapters that no longer exist are removed.
+
+    Args:
+        book_id: book to generate for
+        chapters: limit to these chapters (default: all)
+        force: regenerate even unchanged chapters
+        count: questions to ask for per chapter
+
+    Returns:
+        Chapter names per outcome: generated, unchanged, failed, removed
+
+    Raises:
+        InvalidBookId: malformed book_id
+        BookNotFound: no such book
+    """
+    get_book(book_id)
+    provider = get_embedding_provider()
+    current = _chapter_chunks(book_id)
+    report: Dict[str, List[str]] = {"generated": [], "unchanged": [], "failed": [], "removed": []}
+
+    db = SessionLocal()
+    try:
+        recorded = {row.chapter: row for row in db.query(FaqChapter).filter(FaqChapter.book_id == book_id)}
+
+        if chapters is None:
+            for chapter in sorted(set(recorded) - set(current)):
+                db.query(FaqEntry).filter(FaqEntry.book_id == book_id, FaqEntry.chapter == chapter).delete()
+                db.delete(recorded[chapter])
+                report["removed"].append(chapter)
+            db.commit()
+
+        for chapter in sorted(current if chapters is None else set(chapters) & set(current)):
+            chunks = current[chapter]
+            chapter_hash = content_hash(chunks)
+            row = recorded.get(chapter)
+            if not force and row is not None and row.content_hash == chapter_hash and row.embedding == provider.spec:
+                report["unchanged"].append(chapter)
+                continue
+
+            started = time.monotonic()
+            try:
+                entries = _generate(chapter, chunks, count)
+                vectors = provider.embed([entry["question"] for entry in entries]) if entries else []
+            except Exception as e:
+                # The old entries stay until a later run succeeds
+                record_upstream_error("openai", "faq", e)
+                logger.warning("FAQ generation failed for %s/%s: %s", book_id, chapter, e)
+                report["failed"].append(chapter)
+                continue
+
+            db.query(FaqEntry).filter(FaqEntry.book_id == book_id, FaqEntry.chapter == chapter).delete()
+            for entry, vector in zip(entries, vectors):
+                db.add(FaqEntry(
+                    id=uuid.uuid4().hex,
+                    book_id=book_id,
+                    chapter=chapter,
+                    question=entry["question"],
+                    answer=entry["answer"],
+                    sources=entry["sources"],
+                    vector=np.asarray(vector, dtype="<f4").tobytes(),
+                ))
+            if row is None:
+                row = FaqChapter(id=f"{book_id}:{chapter}", book_id=book_id, chapter=chapter)
+                db.add(row)
+            row.content_hash = chapter_hash
+            row.embedding = provider.spec
+            row.generated_at = datetime.utcnow()
+            db.commit()
+            report["generated"].append(chapter)
+            logger.info(
+                "Generated %d FAQ entries for %s/%s in %.1f s",
+                len(entries), book_id, chapter, time.monotonic() - started,
+            )
+    finally:
+        db.close()
+    return report
+
+
+class FaqMatch:
+    """A stored answer reused for a chat question"""
+
+    def __init__(self, question: str, answer: str, sources: List[str], score: float):
+        self.question = question
+        self.answer = answer
+        self.sources = sources
+        self.score = score
+
+
+class FaqIndex:
+    """
+    Per-worker nearest-neighbour lookup over a book's FAQ questions
+
+    Each book's entries are loaded into one normalized matrix and kept for
+    FAQ_CACHE_TTL_S, so new entries from the generation job show up within
+    that time. Entries embedded with another provider are ignored.
+    """
+
+    def __init__(self, threshold: float = FAQ_MATCH_THRESHOLD, ttl: float = FAQ_CACHE_TTL_S):
+        self.threshold = threshold
+        self.ttl = ttl
+        self._books: Dict[str, Tuple[np.ndarray, List[FaqEntry], float]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, book_id: str) -> Tuple[np.ndarray, List[FaqEntry]]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._books.get(book_id)
+        if cached is not None and cached[2] > now:
+            return cached[0], cached[1]
+
+        provider = get_embedding_provider()
+        db = SessionLocal()
+        try:
+            chapters = [
+                row.chapter for row in db.query(FaqChapter).filter(FaqChapter.book_id == book_id)
+                if row.embedding == provider.spec
+            ]
+            entries = (
+                db.query(FaqEntry)
+                .filter(FaqEntry.book_id == book_id, FaqEntry.chapter.in_(chapters))
+                .all()
+            ) if chapters else []
+            db.expunge_all()
+        finally:
+            db.close()
+
+        matrix = np.zeros((len(entries), provider.dimension), dtype=np.float32)
+        for i, entry in enumerate(entries):
+            matrix[i] = np.frombuffer(entry.vector, dtype="<f4")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        with self._lock:
+            self._books[book_id] = (matrix, entries, now + self.ttl)
+        return matrix, entries
+
+    def match(self, book_id: str, vector: Sequence[float]) -> Optional[FaqMatch]:
+        """The stored answer for the closest question, if it clears the threshold"""
+        matrix, entries = self._load(book_id)
+        if not entries:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        entry = entries[best]
+        return FaqMatch(entry.question, entry.answer, list(entry.sources or []), float(scores[best]))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="Generate FAQ entries for changed chapters")
+    generate.add_argument("--book", required=True)
+    generate.add_argument("--chapter", action="append", help="Only this chapter (repeatable)")
+    generate.add_argument("--force", action="store_true", help="Regenerate unchanged chapters too")
+    generate.add_argument("--count", type=int, default=FAQ_QUESTIONS_PER_CHAPTER)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    from database import init_db
+
+    init_db()
+    try:
+        report = generate_faqs(args.book, args.chapter, args.force, args.count)
+    except (LookupError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
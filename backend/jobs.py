@@ -0,0 +1,372 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from cache import make_key
+from database import Job, SessionLocal
+from metrics import JOB_DURATION, JOBS_PENDING, JOBS_SUBMITTED
+from personalizer import OPENAI_CHAT_MODEL, ContentPersonalizer
+from translator import OPENAI_TRANSLATE_MODEL, ContentTranslator
+
+load_dotenv()
+
+logger = logging.getLogger("rag.jobs")
+
+# Configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Queued plus running jobs per process; submissions beyond this get a 503
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "50"))
+# Chapters are processed in segments of about this many characters
+JOB_SEGMENT_CHARS = int(os.getenv("JOB_SEGMENT_CHARS", "3000"))
+# A queued or running job not updated for this long is considered abandoned
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", "1800"))
+JOB_POLL_INTERVAL_S = float(os.getenv("JOB_POLL_INTERVAL_S", "0.5"))
+JOB_HEARTBEAT_S = 15.0
+
+TRANSLATE_CHAPTER = "translate-chapter"
+PERSONALIZE_CHAPTER = "personalize-chapter"
+
+ACTIVE = ("queued", "running")
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+
+class JobQueueFull(Exception):
+    """This process already has JOB_MAX_PENDING jobs queued or running"""
+
+
+class JobNotFound(LookupError):
+    pass
+
+
+def split_segments(text: str, max_chars: int = JOB_SEGMENT_CHARS) -> List[str]:
+    """
+    Split text at blank lines into segments of roughly max_chars
+
+    Never splits inside a ``` code block, so each segment can be translated
+    with code preserved.
+    """
+    paragraphs: List[str] = []
+    current: List[str] = []
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                paragraphs.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        paragraphs.append("\n".join(current))
+
+    segments: List[str] = []
+    segment = ""
+    for paragraph in paragraphs:
+        if segment and len(segment) + len(paragraph) > max_chars:
+            segments.append(segment)
+            segment = ""
+        segment = f"{segment}\n\n{paragraph}" if segment else paragraph
+    if segment:
+        segments.append(segment)
+    return segments or [text]
+
+
+def _as_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": {"done": job.segments_done, "total": job.segments_total},
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _is_stale(job: Job) -> bool:
+    updated = job.updated_at or job.created_at
+    return job.status in ACTIVE and updated is not None and (
+        datetime.utcnow() - updated > timedelta(seconds=JOB_STALE_S)
+    )
+
+
+class JobManager:
+    """
+    Runs chapter translation and personalization as background jobs
+
+    Jobs live in the database, so any worker can report on or cancel a job
+    that another worker is running. Each job runs on a bounded thread pool
+    in the process that accepted it, one segment at a time, recording
+    progress and partial results after every segment. A repeat of a finished
+    job's request is answered from the stored result.
+    """
+
+    def __init__(
+        self,
+        translator: ContentTranslator,
+        personalizer: ContentPersonalizer,
+        workers: int = JOB_WORKERS,
+        max_pending: int = JOB_MAX_PENDING
+    ):
+        self.translator = translator
+        self.personalizer = personalizer
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self, kind: str, request: Dict[str, Any]) -> str:
+        model = OPENAI_TRANSLATE_MODEL if kind == TRANSLATE_CHAPTER else OPENAI_CHAT_MODEL
+        return make_key("job", kind, model, JOB_SEGMENT_CHARS, request)
+
+    def _segments(self, kind: str, request: Dict[str, Any]) -> List[str]:
+        segments = split_segments(request["chapter_content"])
+        if kind == TRANSLATE_CHAPTER:
+            return [request["chapter_title"]] + segments
+        return segments
+
+    def submit(self, kind: str, request: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """
+        Start a job, or return the job that already answers this request
+
+        Returns:
+            (job, outcome) where outcome is "stored" (finished earlier),
+            "joined" (same request already queued or running) or "queued"
+
+        Raises:
+            JobQueueFull: too many jobs pending in this process
+        """
+        cache_key = self._cache_key(kind, request)
+        db = SessionLocal()
+        try:
+            existing = (
+                db.query(Job)
+                .filter(Job.cache_key == cache_key, Job.status.in_(("succeeded",) + ACTIVE))
+                .order_by(Job.created_at.desc())
+                .first()
+            )
+            if existing is not None and not _is_stale(existing):
+                outcome = "stored" if existing.status == "succeeded" else "joined"
+                JOBS_SUBMITTED.labels(kind, outcome).inc()
+                return _as_dict(existing), outcome
+
+            with self._lock:
+                if len(self._futures) >= self.max_pending:
+                    JOBS_SUBMITTED.labels(kind, "rejected").inc()
+                    raise JobQueueFull(f"{len(self._futures)} jobs pending")
+                job = Job(
+                    id=uuid.uuid4().hex,
+                    kind=kind,
+                    cache_key=cache_key,
+                    status="queued",
+                    request=request,
+                    segments_total=len(self._segments(kind, request)),
+                    segments_done=0,
+                )
+                db.add(job)
+                db.commit()
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+                self._futures[job.id] = self._executor.submit(self._run, job.id)
+                JOBS_PENDING.inc()
+
+            JOBS_SUBMITTED.labels(kind, "queued").inc()
+            return _as_dict(job), "queued"
+        finally:
+            db.close()
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """
+        Raises:
+            JobNotFound: no such job
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                raise JobNotFound(f"Unknown job: {job_id}")
+            if _is_stale(job):
+                self._finish(db, job_id, "failed", error="Job was abandoned (worker restarted)")
+                db.refresh(job)
+            return _as_dict(job)
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a queued or running job; a running job stops after its current segment
+
+        Raises:
+            JobNotFound: no such job
+        """
+        db = SessionLocal()
+        try:
+            if db.get(Job, job_id) is None:
+                raise JobNotFound(f"Unknown job: {job_id}")
+            self._finish(db, job_id, "cancelled")
+        finally:
+            db.close()
+        return self.get(job_id)
+
+    @staticmethod
+    def _finish(db, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """Move an active job to a terminal status; False if it had already finished"""
+        values: Dict[str, Any] = {"status": status, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+        if result is not None:
+            values["result"] = result
+        if error is not None:
+            values["error"] = error
+        updated = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.status.in_(ACTIVE))
+            .update(values, synchronize_session=False)
+        )
+        db.commit()
+        return updated > 0
+
+    def _process(self, kind: str, request: Dict[str, Any], segment: str, last: bool) -> str:
+        # strict: an upstream failure fails the job, rather than storing the
+        # untouched segment as a result later repeats would be served
+        if kind == TRANSLATE_CHAPTER:
+            return self.translator.translate_text(segment, request.get("target_language", "urdu"), strict=True)
+        # One practical example for the chapter, not one per segment
+        return self.personalizer.personalize_content(
+            segment, request["background"], include_examples=last, strict=True
+        )
+
+    def _result(self, kind: str, request: Dict[str, Any], outputs: List[str]) -> Dict[str, Any]:
+        if kind == TRANSLATE_CHAPTER:
+            return {
+                "chapter_title": request["chapter_title"],
+                "translated_title": outputs[0],
+                "translated_content": "\n\n".join(outputs[1:]),
+                "target_language": request.get("target_language", "urdu"),
+            }
+        return {
+            "chapter_title": request["chapter_title"],
+            "personalized_content": "\n\n".join(outputs),
+            "difficulty_hint": self.personalizer.generate_difficulty_hint(request["background"]),
+        }
+
+    def _run(self, job_id: str):
+        started = time.monotonic()
+        kind = "unknown"
+        status = "failed"
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            kind = job.kind
+            claimed = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.status == "queued")
+                .update(
+                    {"status": "running", "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if not claimed:
+                status = "cancelled"
+                return
+
+            request = job.request
+            segments = self._segments(kind, request)
+            outputs: List[str] = []
+            for index, segment in enumerate(segments):
+                db.refresh(job)
+                if job.status != "running":
+                    status = job.status
+                    return
+                outputs.append(self._process(kind, request, segment, last=index == len(segments) - 1))
+                # Partial results let pollers and event streams show segments as they finish
+                db.query(Job).filter(Job.id == job_id, Job.status == "running").update(
+                    {"segments_done": index + 1, "result": {"segments": outputs}, "updated_at": datetime.utcnow()},
+                    synchronize_session=False,
+                )
+                db.commit()
+
+            if self._finish(db, job_id, "succeeded", result=self._result(kind, request, outputs)):
+                status = "succeeded"
+            else:
+                db.refresh(job)
+                status = job.status
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            db.rollback()
+            self._finish(db, job_id, "failed", error=str(e))
+        finally:
+            db.close()
+            with self._lock:
+                self._futures.pop(job_id, None)
+            JOBS_PENDING.dec()
+            JOB_DURATION.labels(kind, status).observe(time.monotonic() - started)
+
+    async def events(self, job_id: str) -> AsyncIterator[str]:
+        """
+        Server-sent events for a job until it finishes
+
+        Emits "segment" events with each finished segment's text, "progress"
+        events, and a final event named after the terminal status that carries
+        the whole job.
+        """
+        sent_segments = 0
+        last_progress = None
+        last_sent = time.monotonic()
+        while True:
+            job = await run_in_threadpool(self.get, job_id)
+
+            segments = (job["result"] or {}).get("segments", []) if job["status"] == "running" else []
+            for index in range(sent_segments, len(segments)):
+                yield _sse("segment", {"index": index, "text": segments[index]})
+            sent_segments = max(sent_segments, len(segments))
+
+            progress = (job["status"], job["progress"]["done"])
+            if progress != last_progress:
+                last_progress = progress
+                last_sent = time.monotonic()
+                yield _sse("progress", {"status": job["status"], **job["progress"]})
+
+            if job["status"] in TERMINAL:
+                yield _sse(job["status"], job)
+                return
+
+            if time.monotonic() - last_sent > JOB_HEARTBEAT_S:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_POLL_INTERVAL_S)
+
+    def shutdown(self):
+        """Stop taking work; jobs that never started are marked failed"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            not_started = [job_id for job_id, future in self._futures.items() if future.cancel()]
+            for job_id in not_started:
+                self._futures.pop(job_id, None)
+                JOBS_PENDING.dec()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if not_started:
+            db = SessionLocal()
+            try:
+                for job_id in not_started:
+                    self._finish(db, job_id, "failed", error="Server shut down before the job started")
+            finally:
+                db.close()
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
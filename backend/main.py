@@ -1,21 +1,65 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from openai import APITimeoutError
+from qdrant_client.models import PointStruct
 import json
+import logging
+import time
+import uuid
 from datetime import datetime
 from auth import router as auth_router
 from database import init_db
 from personalizer import ContentPersonalizer
 from translator import ContentTranslator
+from embedding_batcher import EmbeddingBatcher
+from admission import BULK, INTERACTIVE, admit
+from cache import get_cache, make_key, pack_vector, unpack_vector
+from clients import close_clients, get_openai_client, get_qdrant_client
+from resilience import LLM_BREAKER_RESET_S, LLMDeadlineExceeded, LLMUnavailableError, complete
+from model_router import log_outcome, route
+from sessions import SessionNotFound, SessionStore
+from responses import FastJSONResponse, add_compression, lean
+from profiling import add_profiling
+from jobs import PERSONALIZE_CHAPTER, TRANSLATE_CHAPTER, JobManager, JobNotFound, JobQueueFull
+from embeddings import get_embedding_provider
+from snapshots import SNAPSHOT_SERVE, load_served_snapshots, served_index
+from faq import FAQ_ENABLED, FaqIndex
+from books import (
+    DEFAULT_BOOK_ID,
+    BookExists,
+    BookNotFound,
+    EmbeddingMismatch,
+    InvalidBookId,
+    create_book,
+    drop_book,
+    ensure_book,
+    ingest_collection,
+    list_books,
+    publish_book,
+    rebuild_book,
+    search_collection,
+)
+from metrics import (
+    RequestMetricsMiddleware,
+    metrics_response,
+    record_cache,
+    record_retrieved_chunks,
+    record_upstream_error,
+    record_usage,
+    stage,
+)
 
 load_dotenv()
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger("rag.api")
+
 OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4.1-mini")
 OPENAI_TRANSLATE_MODEL = os.getenv("OPENAI_TRANSLATE_MODEL", OPENAI_CHAT_MODEL)
 
@@ -25,6 +69,9 @@ app = FastAPI(title="Book RAG Chatbot API", version="1.0.0")
 # Initialize personalizer and translator
 personalizer = ContentPersonalizer()
 translator = ContentTranslator()
+sessions = SessionStore()
+jobs = JobManager(translator, personalizer)
+faq_index = FaqIndex()
 
 # Include auth router
 app.include_router(auth_router)
@@ -38,12 +85,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OpenAI and Qdrant clients
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-qdrant_client = QdrantClient(
-    url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-    api_key=os.getenv("QDRANT_API_KEY")
-)
+# gzip/brotli for large responses (inside the metrics middleware, so timings include it)
+add_compression(app)
+
+# Opt-in per-request profiles (X-Profile header or PROFILE_SAMPLE_RATE)
+add_profiling(app)
+
+# Request IDs, per-stage metrics and the structured timing log
+app.add_middleware(RequestMetricsMiddleware)
 
 # Models
 class Message(BaseModel):
@@ -54,17 +103,29 @@ class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = None
     selected_text: Optional[str] = None
+    # Only this book's index is searched
+    book_id: str = DEFAULT_BOOK_ID
+    # Returned by a previous /api/chat reply; the server then supplies the history
+    session_id: Optional[str] = None
+    # For clients without sessions, or to rebuild a session the server lost;
+    # ignored when session_id names a live session
     conversation_history: Optional[List[Message]] = None
 
 class ChatResponse(BaseModel):
     message: str
     sources: Optional[List[str]] = None
     timestamp: str
+    session_id: Optional[str] = None
 
 class ContentChunk(BaseModel):
     text: str
     chapter: str
     section: Optional[str] = None
+    book_id: str = DEFAULT_BOOK_ID
+
+class BookRequest(BaseModel):
+    book_id: str
+    title: Optional[str] = None
 
 class TranslationRequest(BaseModel):
     text: str
@@ -75,60 +136,111 @@ class PersonalizationRequest(BaseModel):
     preferences: dict
     background: dict
 
-# Vector store initialization
-COLLECTION_NAME = "book_content"
+# Stable point IDs, so re-adding a chunk replaces it instead of duplicating it
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2a52-8d0e-4b7a-9a43-0c5d2e9b7f10")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize vector store on startup"""
+    """Initialize database tables, upstream clients and vector store on startup"""
+    init_db()
+
+    # Create the shared clients now rather than on the first request
+    get_openai_client()
+    # Load a local embedding model before traffic arrives
+    get_embedding_provider()
+
     try:
-        # Try to delete existing collection if it exists
-        try:
-            qdrant_client.delete_collection(collection_name=COLLECTION_NAME)
-        except:
-            pass
-        
-        # Create new collection
-        qdrant_client.create_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE),
-        )
+        # Other books are created through /api/books; existing indexes are kept
+        ensure_book(DEFAULT_BOOK_ID)
     except Exception as e:
-        print(f"Warning: Could not initialize vector store: {e}")
+        record_upstream_error("qdrant", "create_collection", e)
 
-@app.post("/api/chat")
+    if SNAPSHOT_SERVE:
+        # Read-only replicas: chat for these books searches the snapshot in process
+        load_served_snapshots()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs and close pooled upstream connections"""
+    jobs.shutdown()
+    close_clients()
+
+@app.post("/api/chat", dependencies=[Depends(admit(INTERACTIVE))])
 async def chat(request: ChatRequest) -> ChatResponse:
     """
     Main chat endpoint with RAG capabilities
     """
     try:
-        # Get embedding for the user query
-        query_embedding = get_embedding(request.message)
+        # Server-side history. An unknown or expired session is rebuilt from
+        # conversation_history when the client sent it; otherwise the client
+        # is told, rather than the conversation silently starting over.
+        history = None
+        if request.session_id:
+            history = await run_in_threadpool(sessions.load, request.session_id)
+            if history is None and request.conversation_history is None:
+                raise SessionNotFound(
+                    f"Unknown or expired session {request.session_id}; resend with conversation_history"
+                )
+        session_id = request.session_id if history is not None else SessionStore.new_id()
+        if history is None:
+            history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history or []]
         
-        # Search relevant documents in Qdrant
-        try:
-            search_results = qdrant_client.search(
-                collection_name=COLLECTION_NAME,
-                query_vector=query_embedding,
-                limit=3
-            )
-        except Exception as e:
-            # If search fails (collection doesn't exist or empty), continue without RAG
-            print(f"Qdrant search error: {e}")
-            search_results = []
+        collection = await run_in_threadpool(search_collection, request.book_id)
+        
+        # Get embedding for the user query (batched with concurrent queries)
+        with stage("embedding"):
+            query_embedding = await embedding_batcher.embed(request.message)
+        
+        # A question close to a precomputed FAQ entry gets the stored answer.
+        # Only an opening question qualifies: a follow-up or a question about
+        # selected text depends on context the stored answer never saw.
+        if FAQ_ENABLED and not history and not request.selected_text:
+            with stage("faq_match"):
+                faq = await run_in_threadpool(faq_index.match, request.book_id, query_embedding)
+            record_cache("faq", faq is not None)
+            if faq is not None:
+                history.append({"role": "user", "content": request.message})
+                history.append({"role": "assistant", "content": faq.answer})
+                await run_in_threadpool(sessions.save, session_id, history)
+                return ChatResponse(
+                    message=faq.answer,
+                    sources=faq.sources,
+                    timestamp=datetime.now().isoformat(),
+                    session_id=session_id
+                )
+        
+        # Search relevant documents in Qdrant, or in a served snapshot
+        with stage("vector_search"):
+            try:
+                index = served_index(request.book_id)
+                if index is not None:
+                    search_results = await run_in_threadpool(index.search, query_embedding, 3)
+                else:
+                    search_results = (await run_in_threadpool(
+                        get_qdrant_client().query_points,
+                        collection_name=collection,
+                        query=query_embedding,
+                        limit=3
+                    )).points
+            except Exception as e:
+                # If search fails (collection doesn't exist or empty), continue without RAG
+                record_upstream_error("qdrant", "search", e)
+                search_results = []
+        record_retrieved_chunks(len(search_results))
         
         # Build context from search results
         context = ""
         sources = []
         
-        for result in search_results:
-            if result.payload.get("text"):
-                context += result.payload.get("text", "") + "\n"
-                sources.append(result.payload.get("source", "unknown"))
-        
-        # Handle selected text context
-        if request.selected_text:
-            context = f"User selected text: {request.selected_text}\n\n{context}"
+        with stage("context_build"):
+            for result in search_results:
+                if result.payload.get("text"):
+                    context += result.payload.get("text", "") + "\n"
+                    sources.append(result.payload.get("source", "unknown"))
+            
+            # Handle selected text context
+            if request.selected_text:
+                context = f"User selected text: {request.selected_text}\n\n{context}"
         
         # Prepare messages for OpenAI
         system_prompt = """You are a helpful AI assistant for a book. 
@@ -140,10 +252,8 @@ Keep answers concise and informative."""
             {"role": "system", "content": system_prompt}
         ]
         
-        # Add conversation history if provided
-        if request.conversation_history:
-            for msg in request.conversation_history:
-                messages.append({"role": msg.role, "content": msg.content})
+        # Add conversation history
+        messages.extend(history)
         
         # Add the context and current message
         messages.append({
@@ -151,37 +261,89 @@ Keep answers concise and informative."""
             "content": f"Context from the book:\n{context}\n\nUser question: {request.message}"
         })
         
+        # Pick model and output budget from cheap local features
+        decision = route(
+            request.message,
+            [result.score for result in search_results],
+            request.selected_text,
+            len(history)
+        )
+        
         # Get response from OpenAI
-        response = openai_client.chat.completions.create(
-            model=OPENAI_CHAT_MODEL,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=500
+        started = time.perf_counter()
+        with stage("completion"):
+            try:
+                response = await run_in_threadpool(
+                    complete,
+                    "chat", decision.model,
+                    fallbacks=decision.fallbacks,
+                    messages=messages,
+                    temperature=decision.temperature,
+                    max_tokens=decision.max_tokens
+                )
+            except Exception as e:
+                record_upstream_error("openai", "chat_completion", e)
+                raise
+        record_usage(response)
+        log_outcome(
+            decision,
+            time.perf_counter() - started,
+            response.usage.completion_tokens if response.usage else None
         )
         
+        answer = response.choices[0].message.content
+        history.append({"role": "user", "content": request.message})
+        history.append({"role": "assistant", "content": answer})
+        await run_in_threadpool(sessions.save, session_id, history)
+        
         return ChatResponse(
-            message=response.choices[0].message.content,
+            message=answer,
             sources=list(set(sources)),
-            timestamp=datetime.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            session_id=session_id
         )
         
+    except InvalidBookId as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (EmbeddingMismatch, SessionNotFound) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(int(LLM_BREAKER_RESET_S))}
+        )
+    except (LLMDeadlineExceeded, APITimeoutError) as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/add-content")
-async def add_content(chunk: ContentChunk) -> dict:
+@app.delete("/api/chat/sessions/{session_id}")
+def end_chat_session(session_id: str) -> dict:
+    """
+    Forget a chat session's history (e.g. "new conversation" in the widget)
+    """
+    sessions.delete(session_id)
+    return {"status": "success"}
+
+@app.post("/api/add-content", dependencies=[Depends(admit(BULK, rate_limit=False))])
+def add_content(chunk: ContentChunk) -> dict:
     """
     Add content chunks to the vector store
     """
     try:
-        embedding = get_embedding(chunk.text)
+        collection = ingest_collection(chunk.book_id)
+        
+        with stage("embedding"):
+            embedding = get_embedding(chunk.text)
         
         # Create point for Qdrant
         point = PointStruct(
-            id=hash(chunk.text) % 2**31,  # Use hash as ID
+            id=str(uuid.uuid5(CHUNK_ID_NAMESPACE, chunk.text)),
             vector=embedding,
             payload={
                 "text": chunk.text,
+                "book_id": chunk.book_id,
                 "chapter": chunk.chapter,
                 "section": chunk.section,
                 "source": f"{chunk.chapter}/{chunk.section or 'main'}"
@@ -189,37 +351,111 @@ async def add_content(chunk: ContentChunk) -> dict:
         )
         
         # Upsert to Qdrant
-        qdrant_client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=[point]
-        )
+        with stage("vector_upsert"):
+            get_qdrant_client().upsert(
+                collection_name=collection,
+                points=[point]
+            )
         
         return {"status": "success", "message": "Content added to vector store"}
         
+    except InvalidBookId as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except EmbeddingMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Book index lifecycle
+@app.get("/api/books")
+def get_books() -> dict:
+    """
+    List books and the collections behind them
+    """
+    return {"books": list_books()}
+
+@app.post("/api/books", dependencies=[Depends(admit(BULK, rate_limit=False))])
+def add_book(request: BookRequest) -> dict:
+    """
+    Create a book with an empty index
+    """
+    try:
+        return {"status": "success", "book": create_book(request.book_id, request.title)}
+    except InvalidBookId as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/translate")
-async def translate_content(request: TranslationRequest) -> dict:
+@app.post("/api/books/{book_id}/rebuild", dependencies=[Depends(admit(BULK, rate_limit=False))])
+def start_book_rebuild(book_id: str) -> dict:
+    """
+    Start re-indexing a book: add-content fills a staging index until publish
+    """
+    try:
+        return {"status": "success", "book": rebuild_book(book_id)}
+    except InvalidBookId as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/books/{book_id}/publish", dependencies=[Depends(admit(BULK, rate_limit=False))])
+def publish_book_rebuild(book_id: str) -> dict:
+    """
+    Swap a finished rebuild in for the book's live index
+    """
+    try:
+        return {"status": "success", "book": publish_book(book_id)}
+    except InvalidBookId as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/books/{book_id}", dependencies=[Depends(admit(BULK, rate_limit=False))])
+def remove_book(book_id: str) -> dict:
+    """
+    Drop a book and its index
+    """
+    try:
+        drop_book(book_id)
+        return {"status": "success"}
+    except InvalidBookId as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/translate", dependencies=[Depends(admit(BULK))])
+def translate_content(request: TranslationRequest) -> dict:
     """
     Translate content to target language (e.g., Urdu)
     """
     try:
-        response = openai_client.chat.completions.create(
-            model=OPENAI_TRANSLATE_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a professional translator. Translate the following text to {request.target_language}. Only provide the translation, no explanations."
-                },
-                {
-                    "role": "user",
-                    "content": request.text
-                }
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
+        with stage("completion"):
+            response = complete(
+                "translate", OPENAI_TRANSLATE_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"You are a professional translator. Translate the following text to {request.target_language}. Only provide the translation, no explanations."
+                    },
+                    {
+                        "role": "user",
+                        "content": request.text
+                    }
+                ],
+                temperature=0.3,
+                max_tokens=1000
+            )
+        record_usage(response)
         
         return {
             "original": request.text,
@@ -228,7 +464,14 @@ async def translate_content(request: TranslationRequest) -> dict:
             "timestamp": datetime.now().isoformat()
         }
         
+    except LLMUnavailableError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(int(LLM_BREAKER_RESET_S))}
+        )
+    except (LLMDeadlineExceeded, APITimeoutError) as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        record_upstream_error("openai", "translate", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/personalize")
@@ -269,13 +512,43 @@ async def health_check() -> dict:
     """Health check endpoint"""
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency, tokens, cache hits and errors"""
+    return metrics_response()
+
+@app.get("/api/embedding-stats")
+async def embedding_stats() -> dict:
+    """Batch size and queueing delay of the query embedding scheduler"""
+    return {"status": "ok", **embedding_batcher.stats()}
+
 def get_embedding(text: str) -> List[float]:
-    """Get embedding from OpenAI API"""
-    response = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    return response.data[0].embedding
+    """Get embedding from the configured embedding provider"""
+    return get_embeddings([text])[0]
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings for several texts, calling the provider once for the cache misses"""
+    provider = get_embedding_provider()
+    cache = get_cache()
+    keys = [make_key("embedding", provider.cache_id, text) for text in texts]
+    cached = cache.get_many(keys)
+
+    embeddings = [unpack_vector(blob) if blob is not None else None for blob in cached]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    for embedding in embeddings:
+        record_cache("embedding", embedding is not None)
+    if not missing:
+        return embeddings
+
+    fresh = provider.embed([texts[i] for i in missing])
+
+    for i, embedding in zip(missing, fresh):
+        embeddings[i] = embedding
+    cache.set_many({keys[i]: pack_vector(embedding) for i, embedding in zip(missing, fresh)})
+    return embeddings
+
+# Micro-batches concurrent /api/chat query embeddings into multi-input calls
+embedding_batcher = EmbeddingBatcher(get_embeddings)
 
 # Additional models for personalization
 class PersonalizeChapterRequest(BaseModel):
@@ -283,15 +556,19 @@ class PersonalizeChapterRequest(BaseModel):
     chapter_content: str
     user_id: Optional[str] = None
     background: dict
+    # Omit echoed inputs (original_content, user_background) from the response
+    lean: bool = False
 
 class TranslateChapterRequest(BaseModel):
     chapter_title: str
     chapter_content: str
     target_language: str = "urdu"
+    # Omit echoed inputs (original_title, original_content) from the response
+    lean: bool = False
 
 # New endpoints for personalization and translation
-@app.post("/api/personalize-chapter")
-async def personalize_chapter(request: PersonalizeChapterRequest) -> dict:
+@app.post("/api/personalize-chapter", dependencies=[Depends(admit(BULK))], response_class=FastJSONResponse)
+def personalize_chapter(request: PersonalizeChapterRequest) -> dict:
     """
     Personalize entire chapter based on user background
     """
@@ -300,6 +577,8 @@ async def personalize_chapter(request: PersonalizeChapterRequest) -> dict:
             request.chapter_content,
             request.background
         )
+        if request.lean:
+            personalized_chapter = lean(personalized_chapter)
         
         return {
             "status": "success",
@@ -309,8 +588,8 @@ async def personalize_chapter(request: PersonalizeChapterRequest) -> dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/translate-chapter")
-async def translate_chapter(request: TranslateChapterRequest) -> dict:
+@app.post("/api/translate-chapter", dependencies=[Depends(admit(BULK))], response_class=FastJSONResponse)
+def translate_chapter(request: TranslateChapterRequest) -> dict:
     """
     Translate entire chapter to target language
     """
@@ -320,6 +599,8 @@ async def translate_chapter(request: TranslateChapterRequest) -> dict:
             request.chapter_content,
             request.target_language
         )
+        if request.lean:
+            translated_chapter = lean(translated_chapter)
         
         return {
             "status": "success",
@@ -328,8 +609,67 @@ async def translate_chapter(request: TranslateChapterRequest) -> dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/get-glossary")
-async def get_glossary(terms: List[str], target_language: str = "urdu") -> dict:
+# Background jobs for long chapters: submit, then poll or stream
+def submit_job(kind: str, request: dict, response: Response) -> dict:
+    try:
+        job, outcome = jobs.submit(kind, request)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Job queue full: {e}", headers={"Retry-After": "30"})
+    # A stored result is returned right away; anything else is still in progress
+    response.status_code = 200 if outcome == "stored" else 202
+    return {"status": "success", "outcome": outcome, "job": job}
+
+@app.post("/api/jobs/translate-chapter", dependencies=[Depends(admit(BULK))], response_class=FastJSONResponse)
+def submit_translate_chapter_job(request: TranslateChapterRequest, response: Response) -> dict:
+    """
+    Translate a chapter in the background, segment by segment
+    """
+    return submit_job(TRANSLATE_CHAPTER, request.model_dump(exclude={"lean"}), response)
+
+@app.post("/api/jobs/personalize-chapter", dependencies=[Depends(admit(BULK))], response_class=FastJSONResponse)
+def submit_personalize_chapter_job(request: PersonalizeChapterRequest, response: Response) -> dict:
+    """
+    Personalize a chapter in the background, segment by segment
+    """
+    return submit_job(PERSONALIZE_CHAPTER, request.model_dump(exclude={"lean", "user_id"}), response)
+
+@app.get("/api/jobs/{job_id}", response_class=FastJSONResponse)
+def get_job(job_id: str) -> dict:
+    """
+    Job status, progress and (partial) result
+    """
+    try:
+        return jobs.get(job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """
+    Server-sent events with each finished segment, progress and the final result
+    """
+    try:
+        await run_in_threadpool(jobs.get, job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(
+        jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str) -> dict:
+    """
+    Cancel a job; a running job stops after its current segment
+    """
+    try:
+        return jobs.cancel(job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/api/get-glossary", dependencies=[Depends(admit(BULK))])
+def get_glossary(terms: List[str], target_language: str = "urdu") -> dict:
     """
     Get glossary of technical terms in target language
     """
@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger("rag.metrics")
+timing_logger = logging.getLogger("rag.timing")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Metrics
+REQUEST_LATENCY = Histogram(
+    "rag_request_duration_seconds",
+    "End-to-end HTTP request latency",
+    ["endpoint", "method", "status"],
+)
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of individual stages inside a request",
+    ["endpoint", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_TOKENS = Histogram(
+    "rag_llm_tokens",
+    "Prompt and completion tokens per LLM call",
+    ["endpoint", "kind"],
+    buckets=(16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+RETRIEVED_CHUNKS = Histogram(
+    "rag_retrieved_chunks",
+    "Number of chunks retrieved from the vector store per query",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 10, 20),
+)
+CACHE_LOOKUPS = Counter(
+    "rag_cache_lookups_total",
+    "Cache lookups by cache name and result",
+    ["cache", "result"],
+)
+UPSTREAM_ERRORS = Counter(
+    "rag_upstream_errors_total",
+    "Failed calls to upstream services",
+    ["service", "operation"],
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Queries per batched embeddings call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+EMBEDDING_QUEUE_DELAY = Histogram(
+    "rag_embedding_queue_delay_seconds",
+    "Time a query waited for its embedding batch to be sent",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "rag_admission_in_flight",
+    "Admitted requests currently being processed",
+    ["endpoint_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rag_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["endpoint_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "rag_admission_queue_wait_seconds",
+    "Time admitted requests spent waiting for a slot",
+    ["endpoint_class"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+ADMISSION_REJECTIONS = Counter(
+    "rag_admission_rejections_total",
+    "Requests rejected by admission control",
+    ["endpoint_class", "reason"],
+)
+
+LLM_RETRIES = Counter(
+    "rag_llm_retries_total",
+    "LLM call attempts retried after a retryable error",
+    ["endpoint", "model"],
+)
+LLM_HEDGES = Counter(
+    "rag_llm_hedges_total",
+    "Hedged LLM requests sent, by which request answered first",
+    ["endpoint", "winner"],
+)
+LLM_FALLBACKS = Counter(
+    "rag_llm_fallbacks_total",
+    "LLM calls served by the fallback model",
+    ["endpoint", "reason"],
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "rag_llm_circuit_open",
+    "1 while the circuit breaker for a model is open",
+    ["model"],
+    multiprocess_mode="max",
+)
+
+ROUTER_DECISIONS = Counter(
+    "rag_router_decisions_total",
+    "Chat requests by routed tier",
+    ["tier", "model"],
+)
+ROUTER_COMPLETION_LATENCY = Histogram(
+    "rag_router_completion_seconds",
+    "Completion latency of routed chat requests by tier",
+    ["tier"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+
+PROFILES_CAPTURED = Counter(
+    "rag_profiles_captured_total",
+    "Requests profiled, by trigger (header or sample) or skipped as busy",
+    ["trigger"],
+)
+
+JOBS_SUBMITTED = Counter(
+    "rag_jobs_submitted_total",
+    "Background job submissions by outcome (queued, stored, joined, rejected)",
+    ["kind", "outcome"],
+)
+JOB_DURATION = Histogram(
+    "rag_job_duration_seconds",
+    "Time from a background job starting to finishing, by final status",
+    ["kind", "status"],
+    buckets=(1, 2.5, 5, 10, 20, 40, 80, 160, 320, 640),
+)
+JOBS_PENDING = Gauge(
+    "rag_jobs_pending",
+    "Background jobs queued or running in this process",
+    multiprocess_mode="livesum",
+)
+
+
+class RequestContext:
+    """Per-request state collected while a request is being handled"""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.stages: List[Tuple[str, float]] = []
+        self.tokens: List[Tuple[str, int]] = []
+        self.retrieved_chunks: Optional[int] = None
+
+
+_current_request: ContextVar[Optional[RequestContext]] = ContextVar(
+    "rag_current_request", default=None
+)
+
+# Label used for work that happens outside an HTTP request
+BACKGROUND_ENDPOINT = "background"
+
+
+def current_request_id() -> Optional[str]:
+    """Request ID of the request being handled, if any"""
+    context = _current_request.get()
+    return context.request_id if context else None
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a stage of the current request
+
+    Inside a request the observation is buffered and flushed with the
+    route template as the endpoint label once the response is sent.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        context = _current_request.get()
+        if context is None:
+            STAGE_LATENCY.labels(BACKGROUND_ENDPOINT, name).observe(elapsed)
+        else:
+            context.stages.append((name, elapsed))
+
+
+def record_usage(response: Any):
+    """Record prompt and completion tokens from an OpenAI completion"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+
+    counts = [
+        ("prompt", getattr(usage, "prompt_tokens", None)),
+        ("completion", getattr(usage, "completion_tokens", None)),
+    ]
+    context = _current_request.get()
+    for kind, count in counts:
+        if count is None:
+            continue
+        if context is None:
+            LLM_TOKENS.labels(BACKGROUND_ENDPOINT, kind).observe(count)
+        else:
+            context.tokens.append((kind, count))
+
+
+def record_retrieved_chunks(count: int):
+    """Record how many chunks a vector search returned"""
+    context = _current_request.get()
+    if context is None:
+        RETRIEVED_CHUNKS.labels(BACKGROUND_ENDPOINT).observe(count)
+    else:
+        context.retrieved_chunks = count
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache hit or miss"""
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_upstream_error(service: str, operation: str, error: Exception):
+    """Count and log a failed upstream call"""
+    UPSTREAM_ERRORS.labels(service, operation).inc()
+    logger.warning(
+        "%s %s failed: %s",
+        service,
+        operation,
+        error,
+        extra={"request_id": current_request_id()},
+    )
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware assigning request IDs and flushing per-request metrics
+
+    Each request gets an ID (taken from the X-Request-ID header when the
+    client sends one), echoed back in the response headers and used as the
+    key of one structured timing log line per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key.decode("latin-1").lower() == REQUEST_ID_HEADER.lower():
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or uuid4().hex
+
+        context = RequestContext(request_id, scope["method"], scope["path"])
+        token = _current_request.set(context)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode(), request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _current_request.reset(token)
+            self._flush(scope, context, status_code, time.perf_counter() - started)
+
+    def _flush(self, scope, context: RequestContext, status_code: int, elapsed: float):
+        """Observe buffered metrics and write the per-request timing log"""
+
+        # Use the route template so path parameters don't explode label cardinality
+        route = scope.get("route")
+        endpoint = getattr(route, "path", None) or "unmatched"
+
+        REQUEST_LATENCY.labels(endpoint, context.method, str(status_code)).observe(elapsed)
+
+        stage_totals: Dict[str, float] = {}
+        for name, seconds in context.stages:
+            STAGE_LATENCY.labels(endpoint, name).observe(seconds)
+            stage_totals[name] = stage_totals.get(name, 0.0) + seconds
+        token_totals: Dict[str, int] = {}
+        for kind, count in context.tokens:
+            LLM_TOKENS.labels(endpoint, kind).observe(count)
+            token_totals[kind] = token_totals.get(kind, 0) + count
+        if context.retrieved_chunks is not None:
+            RETRIEVED_CHUNKS.labels(endpoint).observe(context.retrieved_chunks)
+
+        if endpoint == "/metrics":
+            return
+
+        record = {
+            "request_id": context.request_id,
+            "method": context.method,
+            "endpoint": endpoint,
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000.0, 2),
+            "stages_ms": {name: round(s * 1000.0, 2) for name, s in stage_totals.items()},
+        }
+        if token_totals:
+            record["tokens"] = token_totals
+        if context.retrieved_chunks is not None:
+            record["retrieved_chunks"] = context.retrieved_chunks
+        timing_logger.info(json.dumps(record))
+
+
+def metrics_response() -> Response:
+    """Render all metrics in the Prometheus text exposition format"""
+
+    # Under several gunicorn/uvicorn workers, aggregate the per-process files
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from metrics import ROUTER_COMPLETION_LATENCY, ROUTER_DECISIONS, current_request_id
+
+load_dotenv()
+
+logger = logging.getLogger("rag.router")
+
+# Configuration
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4.1-mini")
+OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-4.1-nano")
+ROUTER_SIMPLE_MAX_TOKENS = int(os.getenv("ROUTER_SIMPLE_MAX_TOKENS", "250"))
+ROUTER_COMPLEX_MAX_TOKENS = int(os.getenv("ROUTER_COMPLEX_MAX_TOKENS", "800"))
+# Requests scoring at or below this are answered by the fast model
+ROUTER_SIMPLE_MAX_SCORE = int(os.getenv("ROUTER_SIMPLE_MAX_SCORE", "1"))
+# Retrieval similarity above which the book clearly holds the answer
+ROUTER_CONFIDENT_RETRIEVAL = float(os.getenv("ROUTER_CONFIDENT_RETRIEVAL", "0.6"))
+ROUTER_WEAK_RETRIEVAL = float(os.getenv("ROUTER_WEAK_RETRIEVAL", "0.3"))
+
+# Wording that signals reasoning rather than lookup
+COMPLEX_PATTERN = re.compile(
+    r"\b(why|compare|comparison|versus|vs\.?|differen\w*|trade-?offs?|design|architect\w*|"
+    r"implement\w*|optimi[sz]\w*|debug\w*|refactor\w*|step[- ]by[- ]step|pros and cons|best way)\b",
+    re.IGNORECASE,
+)
+ENUMERATION_PATTERN = re.compile(r"(^|\n)\s*(\d+[.)]|[-*])\s+")
+
+
+class RouteDecision:
+    """Model and output budget chosen for one chat request"""
+
+    def __init__(self, tier: str, model: str, max_tokens: int, temperature: float, score: int, features: Dict[str, Any], decision_us: float, fallbacks: Optional[List[str]] = None):
+        self.tier = tier
+        self.model = model
+        # Passed to resilience.complete(); None keeps its default fallback
+        self.fallbacks = fallbacks
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.score = score
+        self.features = features
+        self.decision_us = decision_us
+
+
+def extract_features(
+    message: str,
+    retrieval_scores: List[float],
+    selected_text: Optional[str],
+    history_length: int
+) -> Dict[str, Any]:
+    """Cheap request features; nothing here calls out of the process"""
+    return {
+        "words": len(message.split()),
+        "questions": message.count("?"),
+        "complex_terms": len(COMPLEX_PATTERN.findall(message)),
+        "enumerated": bool(ENUMERATION_PATTERN.search(message)),
+        "top_retrieval_score": round(max(retrieval_scores), 3) if retrieval_scores else None,
+        "selected_chars": len(selected_text) if selected_text else 0,
+        "history_length": history_length,
+    }
+
+
+def complexity_score(features: Dict[str, Any]) -> int:
+    """Additive score: higher means more reasoning, so a larger model and budget"""
+    score = 0
+    if features["words"] > 30:
+        score += 2
+    elif features["words"] > 14:
+        score += 1
+    if features["complex_terms"]:
+        score += 2
+    if features["questions"] > 1 or features["enumerated"]:
+        score += 1
+    if features["selected_chars"] > 1500:
+        score += 1
+    if features["history_length"] >= 6:
+        score += 1
+
+    top = features["top_retrieval_score"]
+    if top is None or top < ROUTER_WEAK_RETRIEVAL:
+        # Little support in the book means the model has to synthesize more
+        score += 1
+    elif top >= ROUTER_CONFIDENT_RETRIEVAL:
+        score -= 1
+    return score
+
+
+def route(
+    message: str,
+    retrieval_scores: List[float],
+    selected_text: Optional[str] = None,
+    history_length: int = 0
+) -> RouteDecision:
+    """
+    Pick the model and output budget for a chat request
+
+    Simple lookups go to OPENAI_FAST_MODEL with a tight max_tokens; anything
+    scoring above ROUTER_SIMPLE_MAX_SCORE goes to OPENAI_CHAT_MODEL. Simple
+    requests fall back to OPENAI_CHAT_MODEL, since the default fallback is
+    usually the fast model itself.
+    """
+    started = time.perf_counter()
+
+    if not ROUTER_ENABLED:
+        return RouteDecision("default", OPENAI_CHAT_MODEL, 500, 0.7, 0, {}, 0.0)
+
+    features = extract_features(message, retrieval_scores, selected_text, history_length)
+    score = complexity_score(features)
+
+    fallbacks = None
+    if score <= ROUTER_SIMPLE_MAX_SCORE:
+        tier, model, max_tokens, temperature = "simple", OPENAI_FAST_MODEL, ROUTER_SIMPLE_MAX_TOKENS, 0.3
+        fallbacks = [OPENAI_CHAT_MODEL]
+    else:
+        tier, model, max_tokens, temperature = "complex", OPENAI_CHAT_MODEL, ROUTER_COMPLEX_MAX_TOKENS, 0.7
+
+    decision_us = (time.perf_counter() - started) * 1e6
+    ROUTER_DECISIONS.labels(tier, model).inc()
+    return RouteDecision(tier, model, max_tokens, temperature, score, features, decision_us, fallbacks)
+
+
+def log_outcome(decision: RouteDecision, completion_seconds: float, completion_tokens: Optional[int]):
+    """Log a routing decision together with how the routed call performed"""
+    ROUTER_COMPLETION_LATENCY.labels(decision.tier).observe(completion_seconds)
+    logger.info(json.dumps({
+        "request_id": current_request_id(),
+        "tier": decision.tier,
+        "model": decision.model,
+        "max_tokens": decision.max_tokens,
+        "score": decision.score,
+        "features": decision.features,
+        "decision_us": round(decision.decision_us, 1),
+        "completion_ms": round(completion_seconds * 1000.0, 1),
+        "completion_tokens": completion_tokens,
+    }))
@@ -1,17 +1,20 @@
-from openai import OpenAI
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import os
 from dotenv import load_dotenv
+from metrics import record_cache, record_upstream_error, record_usage, stage
+from resilience import complete, served_by_fallback
+from cache import CacheBackend, get_cache, make_key, pack_text, unpack_text
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4.1-mini")
 
 class ContentPersonalizer:
     """Personalizes book content based on user background"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[CacheBackend] = None):
+        # Shared across workers when CACHE_BACKEND is sqlite or redis
+        self.cache = cache or get_cache()
         self.experience_levels = {
             "beginner": "Beginner (just starting out or learning)",
             "intermediate": "Intermediate (have practical experience)",
@@ -49,7 +52,8 @@ Tailor the following content to match their level and interests.
         self, 
         content: str, 
         background: Dict[str, Any],
-        include_examples: bool = True
+        include_examples: bool = True,
+        strict: bool = False
     ) -> str:
         """
         Personalize content based on user background
@@ -58,6 +62,7 @@ Tailor the following content to match their level and interests.
             content: The original content to personalize
             background: User's background dictionary
             include_examples: Whether to include code examples
+            strict: Raise upstream errors instead of returning the content unchanged
         
         Returns:
             Personalized content
@@ -73,27 +78,45 @@ Also provide a practical example using one of these programming languages they k
         else:
             example_request = ""
         
+        # Backgrounds that produce the same prompt share cached results
+        cache_key = make_key(
+            "personalization", OPENAI_CHAT_MODEL, personalization_prompt, example_request, content
+        )
+        cached = self.cache.get(cache_key)
+        record_cache("personalization", cached is not None)
+        if cached is not None:
+            return unpack_text(cached)
+        
         try:
-            response = client.chat.completions.create(
-                model=OPENAI_CHAT_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": personalization_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please personalize this content:\n\n{content}{example_request}"
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
+            with stage("personalize"):
+                response = complete(
+                    "personalize", OPENAI_CHAT_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": personalization_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Please personalize this content:\n\n{content}{example_request}"
+                        }
+                    ],
+                    temperature=0.7,
+                    max_tokens=2000
+                )
+            record_usage(response)
+            
+            personalized_text = response.choices[0].message.content
+            # The key names the primary model; a fallback answer isn't cached under it
+            if not served_by_fallback(response):
+                self.cache.set(cache_key, pack_text(personalized_text))
             
-            return response.choices[0].message.content
+            return personalized_text
         
         except Exception as e:
-            print(f"Error personalizing content: {e}")
+            record_upstream_error("openai", "personalize", e)
+            if strict:
+                raise
             return content
     
     def generate_difficulty_hint(self, background: Dict[str, Any]) -> str:
@@ -122,27 +145,29 @@ Also provide a practical example using one of these programming languages they k
         languages_str = ", ".join(known_languages[:3])  # Limit to 3 languages
         
         try:
-            response = client.chat.completions.create(
-                model=OPENAI_CHAT_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are a programming expert. Provide brief, practical examples in {languages_str}."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Give me {len(known_languages)} code examples for '{topic}' - one in each of: {languages_str}"
-                    }
-                ],
-                temperature=0.5,
-                max_tokens=1000
-            )
+            with stage("examples"):
+                response = complete(
+                    "examples", OPENAI_CHAT_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": f"You are a programming expert. Provide brief, practical examples in {languages_str}."
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Give me {len(known_languages)} code examples for '{topic}' - one in each of: {languages_str}"
+                        }
+                    ],
+                    temperature=0.5,
+                    max_tokens=1000
+                )
+            record_usage(response)
             
             # Parse the response into individual examples
             return [response.choices[0].message.content]
         
         except Exception as e:
-            print(f"Error generating examples: {e}")
+            record_upstream_error("openai", "examples", e)
             return []
     
     def create_personalized_chapter(
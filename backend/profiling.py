@@ -0,0 +1,185 @@
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from metrics import PROFILES_CAPTURED, current_request_id
+
+load_dotenv()
+
+logger = logging.getLogger("rag.profiling")
+
+# Configuration
+# Sending this value in the X-Profile header profiles the request (empty disables)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fraction of eligible requests profiled without the header
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = [p for p in os.getenv("PROFILE_PATHS", "/api/chat,/api/translate-chapter").split(",") if p]
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Sampling stops after this long even if the response is still streaming
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_FILE_HEADER = "X-Profile-File"
+# The request ID comes from a client header; only these characters reach file names
+UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+MAX_NAME_ID_LENGTH = 64
+
+# Leaf frames of threads parked with nothing to do (idle pool workers, the
+# event loop waiting in select); their samples are dropped
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the Python stacks of every thread at a fixed interval
+
+    A request's work hops between the event loop and threadpool workers, so
+    all threads are sampled rather than profiling a single one. Results are
+    counted as collapsed stacks ("thread;outer;...;leaf count"), the input
+    format of flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        while not self._stop_event.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _write_profile(name: str, sampler: StackSampler) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    # Bounded retention: keep only the newest PROFILE_MAX_FILES profiles
+    profiles = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".folded")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling opted-in requests with StackSampler
+
+    A request is profiled when it carries X-Profile: <PROFILE_TOKEN>, or is
+    picked at PROFILE_SAMPLE_RATE, and its path is in PROFILE_PATHS. Only one
+    request is profiled at a time, since samples cover the whole process;
+    others run unprofiled. The profile's file name is returned in the
+    X-Profile-File header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    def _trigger(self, scope) -> Optional[str]:
+        if not any(scope["path"].startswith(prefix) for prefix in PROFILE_PATHS):
+            return None
+        if PROFILE_TOKEN:
+            for key, value in scope.get("headers", []):
+                if key.decode("latin-1").lower() == PROFILE_HEADER.lower():
+                    if hmac.compare_digest(value.decode("latin-1"), PROFILE_TOKEN):
+                        return "header"
+                    break
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            PROFILES_CAPTURED.labels("busy").inc()
+            await self.app(scope, receive, send)
+            return
+
+        request_id = UNSAFE_NAME_CHARS.sub("", current_request_id() or "")[:MAX_NAME_ID_LENGTH] or uuid4().hex
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{trigger}-{request_id}.folded"
+
+        async def send_with_profile_name(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_FILE_HEADER.lower().encode(), name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000.0)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_name)
+        finally:
+            try:
+                await run_in_threadpool(sampler.stop)
+                path = await run_in_threadpool(_write_profile, name, sampler)
+                PROFILES_CAPTURED.labels(trigger).inc()
+                logger.info(
+                    "Profiled %s %s (%s) in %.1f ms: %d samples -> %s",
+                    scope["method"], scope["path"], trigger,
+                    (time.perf_counter() - started) * 1000.0, sampler.samples, path,
+                )
+            except OSError as e:
+                logger.warning("Could not write profile %s: %s", name, e)
+            finally:
+                self._busy.release()
+
+
+def add_profiling(app: FastAPI):
+    """Install ProfilingMiddleware, unless no trigger is configured (zero overhead when off)"""
+    if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0:
+        app.add_middleware(ProfilingMiddleware)
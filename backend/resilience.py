@@ -0,0 +1,371 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+import openai
+from dotenv import load_dotenv
+
+from clients import get_openai_client
+from metrics import LLM_CIRCUIT_OPEN, LLM_FALLBACKS, LLM_HEDGES, LLM_RETRIES
+
+load_dotenv()
+
+logger = logging.getLogger("rag.resilience")
+
+# Configuration
+# Total time budget per call, retries and fallback included
+LLM_DEADLINE_DEFAULT_S = float(os.getenv("LLM_DEADLINE_DEFAULT_S", "30"))
+LLM_DEADLINES_S = {
+    "chat": float(os.getenv("LLM_DEADLINE_CHAT_S", "20")),
+    "translate": float(os.getenv("LLM_DEADLINE_TRANSLATE_S", "60")),
+    "personalize": float(os.getenv("LLM_DEADLINE_PERSONALIZE_S", "60")),
+    "faq": float(os.getenv("LLM_DEADLINE_FAQ_S", "120")),
+}
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY_S = float(os.getenv("LLM_RETRY_BASE_DELAY_S", "0.25"))
+LLM_RETRY_MAX_DELAY_S = float(os.getenv("LLM_RETRY_MAX_DELAY_S", "4"))
+# Send a duplicate request once the first has been out for this latency
+# percentile of recent successful calls (0 disables hedging)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MAX_WORKERS = int(os.getenv("LLM_HEDGE_MAX_WORKERS", "16"))
+# Most hedges sent per call, as a share of calls
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))
+# Consecutive failures that open a model's circuit, and how long it stays open
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+# Faster model used when the primary is failing or its circuit is open
+OPENAI_FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL", "gpt-4.1-nano")
+# Share of the deadline held back for the fallback model
+LLM_FALLBACK_RESERVE = float(os.getenv("LLM_FALLBACK_RESERVE", "0.3"))
+
+# Recent successful call latencies kept per endpoint for the hedge delay
+LATENCY_WINDOW = 200
+# Hedges that may be saved up while calls are fast
+HEDGE_BUDGET_BURST = 10
+
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.ConflictError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """Every candidate model's circuit is open"""
+
+
+class LLMDeadlineExceeded(Exception):
+    """The call's deadline passed before any attempt succeeded"""
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: closed, open after repeated failures, then half-open
+
+    While open, calls are refused outright. After LLM_BREAKER_RESET_S a
+    single trial call is let through; its outcome closes or reopens the
+    circuit.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < LLM_BREAKER_RESET_S or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.opened_at is not None:
+                logger.info("Circuit for %s closed", self.model)
+                self.opened_at = None
+                LLM_CIRCUIT_OPEN.labels(self.model).set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            reopen = self.trial_in_flight
+            self.trial_in_flight = False
+            if reopen or (self.opened_at is None and self.failures >= LLM_BREAKER_FAILURE_THRESHOLD):
+                if self.opened_at is None:
+                    logger.warning("Circuit for %s opened after %d failures", self.model, self.failures)
+                self.opened_at = time.monotonic()
+                LLM_CIRCUIT_OPEN.labels(self.model).set(1)
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self):
+        self._samples: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            values = sorted(self._samples)
+        return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+class HedgeBudget:
+    """
+    Token bucket capping hedges at a share of calls
+
+    Every call earns LLM_HEDGE_BUDGET of a token, up to HEDGE_BUDGET_BURST;
+    a hedge spends a whole one.
+    """
+
+    def __init__(self, share: float, burst: float):
+        self.share = share
+        self.burst = burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.share)
+
+    def available(self) -> bool:
+        with self._lock:
+            return self.tokens >= 1
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+_hedge_budget = HedgeBudget(LLM_HEDGE_BUDGET, HEDGE_BUDGET_BURST)
+# A request only goes to the pool once it holds a slot, so nothing queues
+# there and a hedge is never sent late. Hedges have slots of their own so
+# hedgeable primaries can't crowd them out.
+_primary_slots = threading.BoundedSemaphore(LLM_HEDGE_MAX_WORKERS)
+_hedge_slots = threading.BoundedSemaphore(LLM_HEDGE_MAX_WORKERS)
+_hedge_executor = ThreadPoolExecutor(max_workers=2 * LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+
+
+def _breaker(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model)
+        return _breakers[model]
+
+
+def _latency(endpoint: str) -> LatencyTracker:
+    with _registry_lock:
+        if endpoint not in _latencies:
+            _latencies[endpoint] = LatencyTracker()
+        return _latencies[endpoint]
+
+
+def _send(model: str, timeout: float, kwargs: Dict[str, Any]):
+    """One HTTP attempt; retries are ours, so the SDK's own are disabled"""
+    client = get_openai_client().with_options(timeout=timeout, max_retries=0)
+    return client.chat.completions.create(model=model, **kwargs)
+
+
+def _send_in_slot(slots: threading.BoundedSemaphore, model: str, timeout: float, kwargs: Dict[str, Any], sent: threading.Event):
+    """_send on a pool worker, giving back the slot reserved for it"""
+    try:
+        sent.set()
+        return _send(model, timeout, kwargs)
+    finally:
+        slots.release()
+
+
+def _submit(slots: threading.BoundedSemaphore, model: str, timeout: float, kwargs: Dict[str, Any]):
+    """Start _send on a pool worker if a slot is free; (None, None) otherwise"""
+    if not slots.acquire(blocking=False):
+        return None, None
+    sent = threading.Event()
+    try:
+        return _hedge_executor.submit(_send_in_slot, slots, model, timeout, kwargs, sent), sent
+    except RuntimeError:
+        slots.release()
+        return None, None
+
+
+def _send_hedged(endpoint: str, model: str, timeout: float, kwargs: Dict[str, Any]):
+    """
+    Send one attempt, duplicating it if it runs past the hedge delay
+
+    The attempt runs on the caller's thread unless it could be hedged: that
+    takes enough latency samples, a hedge token and a free pool worker.
+    Hedges are capped at LLM_HEDGE_BUDGET of calls.
+    """
+    _hedge_budget.earn()
+    hedge_after = _latency(endpoint).percentile(LLM_HEDGE_PERCENTILE) if LLM_HEDGE_PERCENTILE > 0 else None
+    if hedge_after is None or hedge_after >= timeout or not _hedge_budget.available():
+        return _send(model, timeout, kwargs)
+    primary, sent = _submit(_primary_slots, model, timeout, kwargs)
+    if primary is None:
+        return _send(model, timeout, kwargs)
+
+    # The delay counts from when the request is actually sent
+    sent.wait()
+    started = time.monotonic()
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or not _hedge_budget.spend():
+        return primary.result()
+    hedge, _ = _submit(_hedge_slots, model, timeout - (time.monotonic() - started), kwargs)
+    if hedge is None:
+        return primary.result()
+
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=max(timeout - (time.monotonic() - started), 0.0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                # The loser can't be interrupted mid-request; it keeps its
+                # worker until it finishes or times out, and its result is dropped
+                LLM_HEDGES.labels(endpoint, "primary" if future is primary else "hedge").inc()
+                return future.result()
+            error = future.exception()
+    if error is not None:
+        raise error
+    raise LLMDeadlineExceeded(f"{endpoint} call to {model} timed out")
+
+
+def _retry_delay(attempt: int, error: BaseException) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the API sends one"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_RETRY_MAX_DELAY_S)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY_S, LLM_RETRY_BASE_DELAY_S * 2 ** attempt))
+
+
+def _call_with_retries(endpoint: str, model: str, deadline: float, kwargs: Dict[str, Any]):
+    breaker = _breaker(model)
+    error: Optional[BaseException] = None
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if attempt > 0:
+            if not breaker.allow():
+                break
+            LLM_RETRIES.labels(endpoint, model).inc()
+
+        started = time.monotonic()
+        try:
+            response = _send_hedged(endpoint, model, remaining, kwargs)
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            error = e
+            logger.warning("%s call to %s failed (attempt %d): %s", endpoint, model, attempt + 1, e)
+            delay = _retry_delay(attempt, e)
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+            continue
+        except openai.APIStatusError:
+            # A client error (bad request, auth): the model answered, so it is
+            # up; closing the breaker also ends a half-open trial
+            breaker.record_success()
+            raise
+        except Exception:
+            # Hedged attempts timing out, or anything unexpected: count it so
+            # a half-open trial is never left in flight
+            breaker.record_failure()
+            raise
+
+        breaker.record_success()
+        _latency(endpoint).add(time.monotonic() - started)
+        return response
+
+    raise error or LLMDeadlineExceeded(f"{endpoint} call to {model} exceeded its deadline")
+
+
+def served_by_fallback(response: Any) -> bool:
+    """True if complete() answered with a model other than the one asked for"""
+    return getattr(response, "_served_model", None) != getattr(response, "_requested_model", None)
+
+
+def complete(endpoint: str, model: str, fallbacks: Optional[Sequence[str]] = None, **kwargs):
+    """
+    Chat completion with a deadline, retries, hedging, circuit breaking and fallback
+
+    Args:
+        endpoint: Call site name; selects the deadline and latency statistics
+        model: Primary model
+        fallbacks: Models to try in order when the primary fails
+            (default: OPENAI_FALLBACK_MODEL); any equal to model are skipped
+        **kwargs: Passed to chat.completions.create (messages, temperature, ...)
+
+    Returns:
+        The OpenAI chat completion
+
+    Raises:
+        LLMUnavailableError: every candidate model's circuit is open
+        LLMDeadlineExceeded: the deadline passed before an attempt could be made
+        openai.APIError: the last error, when attempts were made and all failed
+    """
+    budget = LLM_DEADLINES_S.get(endpoint, LLM_DEADLINE_DEFAULT_S)
+    started = time.monotonic()
+    deadline = started + budget
+
+    candidates: List[str] = [model]
+    for fallback in ([OPENAI_FALLBACK_MODEL] if fallbacks is None else fallbacks):
+        if fallback and fallback not in candidates:
+            candidates.append(fallback)
+
+    error: Optional[BaseException] = None
+    for index, candidate in enumerate(candidates):
+        if not _breaker(candidate).allow():
+            continue
+
+        is_last = index == len(candidates) - 1
+        candidate_deadline = deadline if is_last else started + budget * (1 - LLM_FALLBACK_RESERVE)
+        try:
+            response = _call_with_retries(endpoint, candidate, candidate_deadline, kwargs)
+        except (RETRYABLE_ERRORS + (LLMDeadlineExceeded,)) as e:
+            error = e
+            continue
+
+        if index > 0:
+            LLM_FALLBACKS.labels(endpoint, "failed" if error else "circuit_open").inc()
+        # Lets callers tell degraded answers apart (see served_by_fallback)
+        response._requested_model = model
+        response._served_model = candidate
+        return response
+
+    if error is None:
+        raise LLMUnavailableError(f"No model available for {endpoint}: all circuits open")
+    raise error
@@ -0,0 +1,68 @@
+import importlib.util
+import os
+from typing import Any
+
+import orjson
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+
+load_dotenv()
+
+# Configuration
+# Responses smaller than this go out uncompressed
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+# Brotli is only used when the optional brotli-asgi package is installed
+RESPONSE_BROTLI = os.getenv("RESPONSE_BROTLI", "true").lower() == "true"
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+# Server-sent event streams are never compressed (a proxy or browser may hold
+# compressed chunks back); starlette's gzip already skips text/event-stream
+UNCOMPRESSED_PATHS = [r"/events$"]
+
+# Echoed request fields dropped from chapter responses in lean mode
+LEAN_OMITTED_FIELDS = ("original_title", "original_content", "user_background")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, for endpoints returning whole chapters"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def brotli_available() -> bool:
+    return RESPONSE_BROTLI and importlib.util.find_spec("brotli_asgi") is not None
+
+
+def add_compression(app: FastAPI):
+    """
+    Compress responses above RESPONSE_COMPRESSION_MIN_BYTES
+
+    Brotli is preferred when the client accepts it, with gzip as the fallback.
+    """
+    if brotli_available():
+        from brotli_asgi import BrotliMiddleware
+
+        app.add_middleware(
+            BrotliMiddleware,
+            quality=RESPONSE_BROTLI_QUALITY,
+            minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+            gzip_fallback=True,
+            excluded_handlers=UNCOMPRESSED_PATHS,
+        )
+    else:
+        app.add_middleware(
+            GZipMiddleware,
+            minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+            compresslevel=RESPONSE_GZIP_LEVEL,
+        )
+
+
+def lean(result: dict) -> dict:
+    """Drop echoed inputs from a chapter response"""
+    return {key: value for key, value in result.items() if key not in LEAN_OMITTED_FIELDS}
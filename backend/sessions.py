@@ -0,0 +1,93 @@
+import os
+import secrets
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from cache import CACHE_BACKEND, CacheBackend, MemoryCache, get_cache, pack_json, unpack_json
+
+load_dotenv()
+
+# Configuration
+# Idle time after which a session is forgotten; every turn restarts the clock
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "3600"))
+# Only the most recent messages are kept and sent to the model
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "20"))
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", "16000"))
+# Live sessions kept per worker with the in-process (memory) cache backend
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+# Stored as [[role code, content], ...] rather than a list of dicts
+ROLE_CODES = {"user": "u", "assistant": "a", "system": "s"}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+
+class SessionNotFound(LookupError):
+    """A session_id the store doesn't know: expired, evicted, or from another store"""
+
+
+def session_cache() -> CacheBackend:
+    """
+    Where sessions live: the shared cache backend, or with the in-process
+    memory backend a separate LRU, so that a burst of embeddings and
+    translations can't evict live conversations
+    """
+    if CACHE_BACKEND == "memory":
+        return MemoryCache(SESSION_MAX_SESSIONS)
+    return get_cache()
+
+
+class SessionStore:
+    """
+    Chat history kept server-side
+
+    Clients send a session ID instead of the whole transcript. With a
+    sqlite or redis CACHE_BACKEND, every worker sees the same sessions.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[CacheBackend] = None,
+        ttl: float = SESSION_TTL_S,
+        max_messages: int = SESSION_MAX_MESSAGES,
+        max_chars: int = SESSION_MAX_CHARS
+    ):
+        self.cache = cache or session_cache()
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+
+    @staticmethod
+    def new_id() -> str:
+        return secrets.token_urlsafe(16)
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """
+        History of a session
+
+        Returns:
+            Messages oldest first, or None if the session is unknown or expired
+        """
+        blob = self.cache.get(self._key(session_id))
+        if blob is None:
+            return None
+        return [{"role": CODE_ROLES.get(code, code), "content": content} for code, content in unpack_json(blob)]
+
+    def save(self, session_id: str, history: List[Dict[str, str]]):
+        """Store a session's history, trimmed to the size caps, and refresh its TTL"""
+        history = history[-self.max_messages:]
+        total = sum(len(message["content"]) for message in history)
+        # Drop whole exchanges from the front so the history starts with a user turn
+        while len(history) > 2 and total > self.max_chars:
+            total -= len(history[0]["content"]) + len(history[1]["content"])
+            history = history[2:]
+
+        compact = [[ROLE_CODES.get(message["role"], message["role"]), message["content"]] for message in history]
+        self.cache.set(self._key(session_id), pack_json(compact), self.ttl)
+
+    def delete(self, session_id: str):
+        self.cache.delete(self._key(session_id))
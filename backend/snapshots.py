@@ -0,0 +1,405 @@
+"""
+Portable snapshots of a book's vector index
+
+A snapshot is one binary file holding every point of a book's live
+collection, so a new replica can be provisioned by copying the file and
+either bulk-loading it into Qdrant or searching it in process, instead of
+re-embedding the whole book.
+
+File layout (little-endian):
+- header: magic, format version, dimension, point count, section offsets
+  and a blake2b checksum of everything after the header
+- metadata: JSON with the book ID, embedding spec and export time
+- vectors: count x dimension float32, 64-byte aligned so the section can be
+  memory-mapped as one matrix
+- payloads: JSON array of [point_id, payload] in vector order
+
+Usage (from the backend directory):
+    python -m snapshots export --book default --output snapshots/default.snap
+    python -m snapshots restore snapshots/default.snap
+    python -m snapshots info snapshots/default.snap
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+from dotenv import load_dotenv
+from qdrant_client.models import Batch, ScoredPoint
+
+from books import (
+    EmbeddingMismatch,
+    collection_for,
+    ensure_book,
+    get_book,
+    ingest_collection,
+    publish_book,
+    rebuild_book,
+)
+from clients import get_qdrant_client
+from embeddings import get_embedding_provider
+
+load_dotenv()
+
+logger = logging.getLogger("rag.snapshots")
+
+# Configuration
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+# Serve chat for books with a snapshot in SNAPSHOT_DIR from memory instead of Qdrant
+SNAPSHOT_SERVE = os.getenv("SNAPSHOT_SERVE", "false").lower() == "true"
+# Points per Qdrant scroll page on export and per upsert on restore
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "512"))
+
+MAGIC = b"RAGSNAP\x00"
+FORMAT_VERSION = 1
+# magic, version, reserved, dimension, count, meta length,
+# vectors offset, payloads offset, payloads length, checksum
+HEADER = struct.Struct("<8sHHIQQQQQ16s")
+ALIGNMENT = 64
+SNAPSHOT_SUFFIX = ".snap"
+
+
+class SnapshotFormatError(ValueError):
+    """Not a snapshot, an unsupported format version, or a damaged file"""
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_snapshot(book_id: str, path: str, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Write a book's live collection to a snapshot file
+
+    Vectors are streamed to disk page by page; the file is written under a
+    temporary name and renamed into place when complete.
+
+    Returns:
+        The snapshot's metadata, including the point count
+
+    Raises:
+        InvalidBookId: malformed book_id
+        BookNotFound: no such book
+    """
+    book = get_book(book_id)
+    dimension = book["embedding"]["dimension"]
+    meta = {
+        "book_id": book_id,
+        "title": book["title"],
+        "embedding": book["embedding"],
+        "exported_at": datetime.utcnow().isoformat(),
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    vectors_offset = _aligned(HEADER.size + len(meta_bytes))
+
+    checksum = hashlib.blake2b(digest_size=16)
+    checksum.update(meta_bytes)
+    points: List[Tuple[Any, Any]] = []
+    client = get_qdrant_client()
+    collection = collection_for(book_id)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(b"\x00" * HEADER.size)
+            f.write(meta_bytes)
+            f.write(b"\x00" * (vectors_offset - HEADER.size - len(meta_bytes)))
+
+            offset = None
+            while True:
+                page, offset = client.scroll(
+                    collection_name=collection,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                if page:
+                    block = np.asarray([point.vector for point in page], dtype="<f4")
+                    if block.shape[1] != dimension:
+                        raise SnapshotFormatError(
+                            f"Collection {collection} holds {block.shape[1]}-d vectors, expected {dimension}"
+                        )
+                    data = block.tobytes()
+                    checksum.update(data)
+                    f.write(data)
+                    points.extend((point.id, point.payload) for point in page)
+                if offset is None:
+                    break
+
+            payloads_offset = f.tell()
+            payload_bytes = orjson.dumps(points)
+            checksum.update(payload_bytes)
+            f.write(payload_bytes)
+
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, 0, dimension, len(points), len(meta_bytes),
+                vectors_offset, payloads_offset, len(payload_bytes), checksum.digest(),
+            ))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info("Exported %d points of book %s to %s", len(points), book_id, path)
+    return {**meta, "count": len(points), "path": path}
+
+
+class Snapshot:
+    """
+    A snapshot file opened for reading
+
+    The vectors are a read-only memory map: opening is cheap and processes on
+    a host share the pages. Payloads are parsed on first use.
+
+    Raises:
+        SnapshotFormatError: the file is not a valid snapshot
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise SnapshotFormatError(f"{path}: file too short")
+            (magic, version, _, self.dimension, self.count, self._meta_length,
+             self._vectors_offset, self._payloads_offset, self._payloads_length, self._checksum) = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise SnapshotFormatError(f"{path}: not a snapshot file")
+            if version != FORMAT_VERSION:
+                raise SnapshotFormatError(f"{path}: unsupported snapshot version {version}")
+            self.meta: Dict[str, Any] = json.loads(f.read(self._meta_length))
+
+        expected_size = self._payloads_offset + self._payloads_length
+        if os.path.getsize(path) != expected_size:
+            raise SnapshotFormatError(f"{path}: truncated or padded (expected {expected_size} bytes)")
+        if self.count:
+            self.vectors = np.memmap(
+                path, dtype="<f4", mode="r", offset=self._vectors_offset, shape=(self.count, self.dimension)
+            )
+        else:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        if verify:
+            self.verify()
+        self._points: Optional[List[Tuple[Any, Any]]] = None
+
+    @property
+    def book_id(self) -> str:
+        return self.meta["book_id"]
+
+    @property
+    def embedding(self) -> Dict[str, Any]:
+        return self.meta["embedding"]
+
+    def verify(self):
+        """Check the checksum over metadata, vectors and payloads"""
+        checksum = hashlib.blake2b(digest_size=16)
+        with open(self.path, "rb") as f:
+            f.seek(HEADER.size)
+            checksum.update(f.read(self._meta_length))
+            f.seek(self._vectors_offset)
+            remaining = self._payloads_offset + self._payloads_length - self._vectors_offset
+            while remaining > 0:
+                chunk = f.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                checksum.update(chunk)
+                remaining -= len(chunk)
+        if checksum.digest() != self._checksum:
+            raise SnapshotFormatError(f"{self.path}: checksum mismatch")
+
+    @property
+    def points(self) -> List[Tuple[Any, Any]]:
+        """(point_id, payload) pairs in vector order"""
+        if self._points is None:
+            with open(self.path, "rb") as f:
+                f.seek(self._payloads_offset)
+                self._points = orjson.loads(f.read(self._payloads_length))
+        return self._points
+
+    def batches(self, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Iterator[Tuple[list, np.ndarray, list]]:
+        """(ids, vectors, payloads) in chunks of batch_size"""
+        points = self.points
+        for start in range(0, self.count, batch_size):
+            chunk = points[start:start + batch_size]
+            yield [point[0] for point in chunk], self.vectors[start:start + batch_size], [point[1] for point in chunk]
+
+
+def _check_embedding(snapshot: Snapshot):
+    current = get_embedding_provider().spec
+    if snapshot.embedding != current:
+        raise EmbeddingMismatch(
+            f"{snapshot.path} holds {snapshot.embedding['provider']}/{snapshot.embedding['model']} "
+            f"({snapshot.embedding['dimension']}d) vectors but this server embeds with "
+            f"{current['provider']}/{current['model']} ({current['dimension']}d)"
+        )
+
+
+def restore_snapshot(
+    path: str,
+    book_id: Optional[str] = None,
+    batch_size: int = SNAPSHOT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Load a snapshot into Qdrant as the book's live index
+
+    Goes through the normal rebuild lifecycle: the points are bulk-upserted
+    into a staging collection, which is then published, so chat keeps
+    answering from the old index until the load is complete.
+
+    Args:
+        path: snapshot file
+        book_id: book to restore into (default: the book it was exported from)
+        batch_size: points per upsert
+
+    Returns:
+        The book after publishing
+
+    Raises:
+        SnapshotFormatError: invalid snapshot file
+        EmbeddingMismatch: the snapshot was made with another embedding provider
+    """
+    snapshot = Snapshot(path)
+    _check_embedding(snapshot)
+    book_id = book_id or snapshot.book_id
+
+    ensure_book(book_id, snapshot.meta.get("title"))
+    rebuild_book(book_id)
+    staging = ingest_collection(book_id)
+    client = get_qdrant_client()
+    for ids, vectors, payloads in snapshot.batches(batch_size):
+        client.upsert(
+            collection_name=staging,
+            points=Batch(ids=ids, vectors=vectors.tolist(), payloads=payloads),
+            wait=True,
+        )
+    book = publish_book(book_id)
+    logger.info("Restored %d points into book %s from %s", snapshot.count, book_id, path)
+    return {**book, "count": snapshot.count}
+
+
+class SnapshotIndex:
+    """
+    Exact cosine search over a snapshot, in process
+
+    One matrix-vector product over the memory-mapped vectors per query;
+    results have the same shape as Qdrant's, so chat can use either.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        norms = np.linalg.norm(snapshot.vectors, axis=1)
+        self._inverse_norms = (1.0 / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+    def search(self, vector: Sequence[float], limit: int = 3) -> List[ScoredPoint]:
+        if self.snapshot.count == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = (self.snapshot.vectors @ query) * self._inverse_norms
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        points = self.snapshot.points
+        return [
+            ScoredPoint(id=points[i][0], version=0, score=float(scores[i]), payload=points[i][1])
+            for i in top
+        ]
+
+
+# book_id -> index, loaded at startup when SNAPSHOT_SERVE is on
+_served: Dict[str, SnapshotIndex] = {}
+_served_lock = threading.Lock()
+
+
+def load_served_snapshots(directory: str = SNAPSHOT_DIR) -> List[str]:
+    """
+    Load every snapshot in directory for in-process search
+
+    Snapshots that can't be used (damaged, another embedding provider) are
+    skipped with a warning, and chat for that book falls back to Qdrant.
+
+    Returns:
+        IDs of the books now served from snapshots
+    """
+    if not os.path.isdir(directory):
+        return []
+    loaded = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(SNAPSHOT_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            snapshot = Snapshot(path)
+            _check_embedding(snapshot)
+        except (OSError, SnapshotFormatError, EmbeddingMismatch) as e:
+            logger.warning("Not serving snapshot %s: %s", path, e)
+            continue
+        loaded[snapshot.book_id] = SnapshotIndex(snapshot)
+        logger.info("Serving book %s from %s (%d points)", snapshot.book_id, path, snapshot.count)
+    with _served_lock:
+        _served.clear()
+        _served.update(loaded)
+    return sorted(loaded)
+
+
+def served_index(book_id: str) -> Optional[SnapshotIndex]:
+    """The in-process index for a book, or None to search Qdrant"""
+    return _served.get(book_id)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write a book's live index to a snapshot")
+    export.add_argument("--book", required=True)
+    export.add_argument("--output", help=f"Snapshot path (default: {SNAPSHOT_DIR}/<book>{SNAPSHOT_SUFFIX})")
+
+    restore = commands.add_parser("restore", help="Load a snapshot into Qdrant and publish it")
+    restore.add_argument("path")
+    restore.add_argument("--book", help="Book to restore into (default: the exported book)")
+
+    info = commands.add_parser("info", help="Show a snapshot's metadata and verify it")
+    info.add_argument("path")
+
+    for command in (export, restore):
+        command.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    try:
+        if args.command == "export":
+            from database import init_db
+
+            init_db()
+            path = args.output or os.path.join(SNAPSHOT_DIR, f"{args.book}{SNAPSHOT_SUFFIX}")
+            result = export_snapshot(args.book, path, args.batch_size)
+        elif args.command == "restore":
+            from database import init_db
+
+            init_db()
+            result = restore_snapshot(args.path, args.book, args.batch_size)
+        else:
+            snapshot = Snapshot(args.path)
+            result = {**snapshot.meta, "count": snapshot.count, "dimension": snapshot.dimension}
+    except (SnapshotFormatError, EmbeddingMismatch, LookupError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
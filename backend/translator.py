@@ -1,12 +1,13 @@
-from openai import OpenAI
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
+from metrics import record_cache, record_upstream_error, record_usage, stage
+from resilience import complete, served_by_fallback
+from cache import CacheBackend, get_cache, make_key, pack_text, unpack_text
 import json
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 OPENAI_TRANSLATE_MODEL = os.getenv(
     "OPENAI_TRANSLATE_MODEL",
     os.getenv("OPENAI_CHAT_MODEL", "gpt-4.1-mini")
@@ -23,14 +24,16 @@ class ContentTranslator:
         "arabic": "Arabic",
     }
     
-    def __init__(self):
-        self.translation_cache: Dict[str, str] = {}
+    def __init__(self, cache: Optional[CacheBackend] = None):
+        # Shared across workers when CACHE_BACKEND is sqlite or redis
+        self.cache = cache or get_cache()
     
     def translate_text(
         self,
         text: str,
         target_language: str = "urdu",
-        preserve_code: bool = True
+        preserve_code: bool = True,
+        strict: bool = False
     ) -> str:
         """
         Translate text to target language
@@ -39,15 +42,18 @@ class ContentTranslator:
             text: Text to translate
             target_language: Target language code (e.g., 'urdu')
             preserve_code: Keep code blocks in original language if True
+            strict: Raise upstream errors instead of returning the text untranslated
         
         Returns:
             Translated text
         """
         
         # Check cache
-        cache_key = f"{target_language}:{text[:100]}"
-        if cache_key in self.translation_cache:
-            return self.translation_cache[cache_key]
+        cache_key = make_key("translation", OPENAI_TRANSLATE_MODEL, target_language, preserve_code, text)
+        cached = self.cache.get(cache_key)
+        record_cache("translation", cached is not None)
+        if cached is not None:
+            return unpack_text(cached)
         
         language_name = self.SUPPORTED_LANGUAGES.get(
             target_language.lower(),
@@ -65,31 +71,36 @@ Preserve the structure and formatting."""
 Preserve all formatting and structure. Only provide the translation, no explanations."""
         
         try:
-            response = client.chat.completions.create(
-                model=OPENAI_TRANSLATE_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                temperature=0.3,  # Lower temperature for more consistent translations
-                max_tokens=min(2000, len(text) * 2)
-            )
+            with stage("translate"):
+                response = complete(
+                    "translate", OPENAI_TRANSLATE_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": text
+                        }
+                    ],
+                    temperature=0.3,  # Lower temperature for more consistent translations
+                    max_tokens=min(2000, len(text) * 2)
+                )
+            record_usage(response)
             
             translated_text = response.choices[0].message.content
             
-            # Cache the result
-            self.translation_cache[cache_key] = translated_text
+            # Cache the result, unless it is the fallback model's (keyed as the primary's)
+            if not served_by_fallback(response):
+                self.cache.set(cache_key, pack_text(translated_text))
             
             return translated_text
         
         except Exception as e:
-            print(f"Error translating text: {e}")
+            record_upstream_error("openai", "translate", e)
+            if strict:
+                raise
             return text
     
     def translate_chapter(
@@ -152,26 +163,28 @@ Preserve formatting and structure."""
         user_message = f"Context: {context}\n\nText to translate:\n{text}"
         
         try:
-            response = client.chat.completions.create(
-                model=OPENAI_TRANSLATE_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": user_message
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=2000
-            )
+            with stage("translate_with_context"):
+                response = complete(
+                    "translate", OPENAI_TRANSLATE_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": user_message
+                        }
+                    ],
+                    temperature=0.3,
+                    max_tokens=2000
+                )
+            record_usage(response)
             
             return response.choices[0].message.content
         
         except Exception as e:
-            print(f"Error with contextual translation: {e}")
+            record_upstream_error("openai", "translate_with_context", e)
             return text
     
     def get_glossary(
@@ -198,22 +211,24 @@ Preserve formatting and structure."""
         terms_str = "\n".join([f"- {term}" for term in key_terms])
         
         try:
-            response = client.chat.completions.create(
-                model=OPENAI_TRANSLATE_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""You are a technical translator. Provide {language_name} translations for technical terms.
+            with stage("glossary"):
+                response = complete(
+                    "glossary", OPENAI_TRANSLATE_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": f"""You are a technical translator. Provide {language_name} translations for technical terms.
 Format your response as JSON with term as key and translation as value."""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Translate these technical terms to {language_name}:\n{terms_str}"
-                    }
-                ],
-                temperature=0.2,
-                max_tokens=1000
-            )
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Translate these technical terms to {language_name}:\n{terms_str}"
+                        }
+                    ],
+                    temperature=0.2,
+                    max_tokens=1000
+                )
+            record_usage(response)
             
             response_text = response.choices[0].message.content
             
@@ -226,7 +241,7 @@ Format your response as JSON with term as key and translation as value."""
                 return {term: term for term in key_terms}
         
         except Exception as e:
-            print(f"Error generating glossary: {e}")
+            record_upstream_error("openai", "glossary", e)
             return {term: term for term in key_terms}
     
     def batch_translate(
@@ -6,6 +6,8 @@ import AuthModal from '@site/src/components/AuthModal';
 function FloatingChatBot() {
   const [isOpen, setIsOpen] = useState(false);
   const [messages, setMessages] = useState<any[]>([]);
+  // Server-side history: once we have a session, only the new message is sent
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [selectedText, setSelectedText] = useState('');
@@ -62,23 +64,35 @@ function FloatingChatBot() {
 
     try {
       const token = localStorage.getItem('auth_token');
-      const response = await fetch(`${API_URL}/api/chat`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          ...(token && { Authorization: `Bearer ${token}` }),
-        },
-        body: JSON.stringify({
-          message: messageContent,
-          conversation_history: messages.map(m => ({
-            role: m.role,
-            content: m.content,
-          })),
-          selected_text: currentSelected || undefined,
-        }),
-      });
+      const conversationHistory = messages.map(m => ({
+        role: m.role,
+        content: m.content,
+      }));
+      const postChat = (history: boolean) =>
+        fetch(`${API_URL}/api/chat`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            ...(token && { Authorization: `Bearer ${token}` }),
+          },
+          body: JSON.stringify({
+            message: messageContent,
+            ...(history
+              ? { conversation_history: conversationHistory }
+              : { session_id: sessionId }),
+            selected_text: currentSelected || undefined,
+          }),
+        });
+      let response = await postChat(!sessionId);
+      if (sessionId && response.status === 409) {
+        // The server lost our session; it rebuilds it from the local transcript
+        response = await postChat(true);
+      }
 
       const data = await response.json();
+      if (data.session_id) {
+        setSessionId(data.session_id);
+      }
 
       const assistantMessage = {
         id: (Date.now() + 1).toString(),
@@ -24,6 +24,8 @@ export const ChatBot: React.FC<ChatBotProps> = ({
   onTranslate,
 }) => {
   const [messages, setMessages] = useState<Message[]>([]);
+  // Server-side history: once we have a session, only the new message is sent
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [selectedText, setSelectedText] = useState('');
@@ -70,15 +72,35 @@ export const ChatBot: React.FC<ChatBotProps> = ({
     setIsLoading(true);
 
     try {
-      const response = await axios.post(`${apiUrl}/api/chat`, {
+      const request = {
         message: input,
         user_id: userId,
         selected_text: selectedText || undefined,
-        conversation_history: messages.map((msg) => ({
-          role: msg.role,
-          content: msg.content,
-        })),
-      });
+      };
+      const conversationHistory = messages.map((msg) => ({
+        role: msg.role,
+        content: msg.content,
+      }));
+      let response;
+      try {
+        response = await axios.post(
+          `${apiUrl}/api/chat`,
+          sessionId
+            ? { ...request, session_id: sessionId }
+            : { ...request, conversation_history: conversationHistory }
+        );
+      } catch (error) {
+        // 409: the server lost our session; it rebuilds it from the local transcript
+        if (!sessionId || !axios.isAxiosError(error) || error.response?.status !== 409) {
+          throw error;
+        }
+        response = await axios.post(`${apiUrl}/api/chat`, {
+          ...request,
+          conversation_history: conversationHistory,
+        });
+      }
+
+      setSessionId(response.data.session_id ?? null);
 
       const assistantMessage: Message = {
         id: (Date.now() + 1).toString(),